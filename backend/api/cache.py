@@ -0,0 +1,123 @@
+import datetime
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+RECIPES_VERSION = "recipes"
+RECIPE_LIST_VERSION = "recipes:list"
+RECIPE_SIGNATURES_VERSION = "recipes:signatures"
+TAGS_VERSION = "tags"
+INGREDIENTS_VERSION = "ingredients"
+
+
+def recipe_version(recipe_id):
+    return f"recipe:{recipe_id}"
+
+
+def user_version(user_id):
+    """Версия пользовательских отметок: избранного, покупок и подписок."""
+    return f"user:{user_id}"
+
+
+def cart_version(user_id):
+    """Версия итогов списка покупок пользователя."""
+    return f"cart:{user_id}"
+
+
+def get_version(name):
+    """Возвращает текущую версию пространства имен кеша.
+
+    Версии хранятся в общем кеше, поэтому изменение данных в одном
+    процессе сразу видно всем остальным.
+    """
+    return cache.get_or_set(f"version:{name}", time.time_ns, None)
+
+
+def version_to_datetime(version):
+    return datetime.datetime.fromtimestamp(
+        version / 1e9, tz=datetime.timezone.utc
+    )
+
+
+def bump_version(*names):
+    version = time.time_ns()
+    cache.set_many({f"version:{name}": version for name in names}, None)
+
+
+def bump_version_on_commit(*names):
+    """Меняет версии после фиксации текущей транзакции.
+
+    Иначе параллельный запрос успел бы закешировать прежние данные под
+    новой версией.
+    """
+    transaction.on_commit(lambda: bump_version(*names))
+
+
+def get_request_key(request):
+    """Ключ запроса, не зависящий от порядка параметров строки запроса."""
+    query = sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+    )
+    return hashlib.md5(
+        f"{request.get_host()}{request.path}{query}".encode()
+    ).hexdigest()
+
+
+def cache_stream(key, chunks, max_size):
+    """Отдает части потока и сохраняет их в кеш после последней части.
+
+    Поток больше ``max_size`` байт не кешируется, поэтому в памяти
+    держится не больше ``max_size`` байт.
+    """
+    parts = []
+    size = 0
+    for chunk in chunks:
+        if parts is not None:
+            size += len(chunk)
+            if size > max_size:
+                parts = None
+            else:
+                parts.append(chunk)
+        yield chunk
+    if parts is not None:
+        cache.set(key, b"".join(parts), settings.RESPONSE_CACHE_TIMEOUT)
+
+
+def anonymous_response_cache(get_version_names):
+    """Кеширует успешные ответы для анонимных пользователей.
+
+    ``get_version_names`` получает представление и возвращает имена
+    версий, от которых зависит ответ; изменение любой из них делает
+    закешированный ответ недоступным.
+    """
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            if not request.user.is_anonymous:
+                return method(self, request, *args, **kwargs)
+            versions = ":".join(
+                str(get_version(name)) for name in get_version_names(self)
+            )
+            key = f"response:{get_request_key(request)}:{versions}"
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+            response = method(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(
+                    key, response.data, settings.RESPONSE_CACHE_TIMEOUT
+                )
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,53 @@
+import hashlib
+from functools import wraps
+
+from django.utils.cache import (
+    get_conditional_response,
+    patch_vary_headers,
+    quote_etag,
+)
+from django.utils.http import http_date
+from rest_framework import status
+
+from .cache import get_request_key
+
+
+def conditional_get(get_validators):
+    """Обрабатывает условные GET-запросы до сериализации ответа.
+
+    ``get_validators`` получает представление и возвращает пару из
+    значений, однозначно определяющих ответ, и даты его изменения, либо
+    ``None``, если валидаторы вычислить нельзя. В ETag учитываются также
+    адрес со строкой запроса и формат ответа. При совпадении
+    ``If-None-Match`` или ``If-Modified-Since`` возвращается ответ 304.
+    """
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            validators = get_validators(self)
+            if validators is None:
+                return method(self, request, *args, **kwargs)
+            parts, last_modified = validators
+            parts = (
+                parts,
+                get_request_key(request),
+                request.accepted_renderer.format,
+            )
+            etag = quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+            last_modified = int(last_modified.timestamp())
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = method(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+            patch_vary_headers(response, ("Accept", "Authorization"))
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,148 @@
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import F
+
+from recipes.models import Recipe, RecipeDocument
+
+from .representations import RECIPE_ROW_FIELDS, render_recipe_rows
+from .serializers import (
+    CustomUserSerializer,
+    RecipeIngredientSerializer,
+    RecipeReadSerializer,
+    TagSerializer,
+)
+from .utils import get_subscribed_author_ids
+
+RECIPE_FLAGS = ("is_favorited", "is_in_shopping_cart")
+AUTHOR_FLAG = "is_subscribed"
+REBUILD_BATCH_SIZE = 500
+
+
+def strip_user_flags(representations):
+    """Убирает из представлений рецептов пользовательские отметки.
+
+    Ссылки на изображения остаются относительными и дополняются адресом
+    сервера при чтении.
+    """
+    documents = {}
+    for item in representations:
+        document = dict(item)
+        for flag in RECIPE_FLAGS:
+            del document[flag]
+        document["author"] = dict(document["author"])
+        del document["author"][AUTHOR_FLAG]
+        documents[document["id"]] = document
+    return documents
+
+
+def build_recipe_documents(queryset):
+    """Строит документы рецептов из строк ``values()``."""
+    return strip_user_flags(
+        render_recipe_rows(
+            queryset.with_user_flags(AnonymousUser()).values(
+                *RECIPE_ROW_FIELDS
+            ),
+            request=None,
+        )
+    )
+
+
+def serialize_recipe_documents(queryset):
+    """Строит документы рецептов через ``RecipeReadSerializer``."""
+    return strip_user_flags(
+        RecipeReadSerializer(
+            queryset.with_user_flags(AnonymousUser()).with_read_relations(),
+            many=True,
+        ).data
+    )
+
+
+def store_recipe_documents(documents):
+    """Сохраняет документы рецептов одним запросом."""
+    RecipeDocument.objects.bulk_create(
+        (
+            RecipeDocument(recipe_id=recipe_id, data=document)
+            for recipe_id, document in documents.items()
+        ),
+        update_conflicts=True,
+        unique_fields=("recipe",),
+        update_fields=("data", "updated_at"),
+    )
+
+
+def rebuild_recipe_documents(recipe_ids):
+    """Пересобирает и сохраняет документы указанных рецептов."""
+    documents = build_recipe_documents(
+        Recipe.objects.filter(pk__in=recipe_ids)
+    )
+    store_recipe_documents(documents)
+    return documents
+
+
+def iter_recipe_id_batches(queryset):
+    recipe_ids = list(queryset.values_list("pk", flat=True))
+    for start in range(0, len(recipe_ids), REBUILD_BATCH_SIZE):
+        yield recipe_ids[start:start + REBUILD_BATCH_SIZE]
+
+
+def rebuild_recipe_documents_for(queryset):
+    """Пересобирает документы рецептов из набора запросов пакетами."""
+    for recipe_ids in iter_recipe_id_batches(queryset):
+        rebuild_recipe_documents(recipe_ids)
+
+
+def ordered(data, fields):
+    return {field: data[field] for field in fields}
+
+
+def absolute_url(request, url):
+    if url and request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def merge_recipe_document(document, row, subscribed_ids, request):
+    """Дополняет документ рецепта отметками текущего пользователя."""
+    author = dict(document["author"])
+    author[AUTHOR_FLAG] = author["id"] in subscribed_ids
+    author["avatar"] = absolute_url(request, author["avatar"])
+    data = dict(document)
+    data.update(
+        author=ordered(author, CustomUserSerializer.Meta.fields),
+        tags=[ordered(tag, TagSerializer.Meta.fields) for tag in data["tags"]],
+        ingredients=[
+            ordered(ingredient, RecipeIngredientSerializer.Meta.fields)
+            for ingredient in data["ingredients"]
+        ],
+        image=absolute_url(request, data["image"]),
+        **{flag: row[flag] for flag in RECIPE_FLAGS},
+    )
+    return ordered(data, RecipeReadSerializer.Meta.fields)
+
+
+def render_recipe_documents(rows, request):
+    """Возвращает представления рецептов, собранные из документов.
+
+    Строки должны содержать ``id`` и отметки пользователя из
+    ``with_user_flags``. Документы, которые старше рецепта или его автора,
+    а также отсутствующие документы пересобираются на лету.
+    """
+    rows = list(rows)
+    recipe_ids = [row["id"] for row in rows]
+    documents = dict(
+        RecipeDocument.objects.filter(
+            recipe_id__in=recipe_ids,
+            updated_at__gte=F("recipe__updated_at"),
+        )
+        .filter(updated_at__gte=F("recipe__author__updated_at"))
+        .values_list("recipe_id", "data")
+    )
+    missing_ids = [pk for pk in recipe_ids if pk not in documents]
+    if missing_ids:
+        documents.update(rebuild_recipe_documents(missing_ids))
+    subscribed_ids = get_subscribed_author_ids(request)
+    return [
+        merge_recipe_document(
+            documents[row["id"]], row, subscribed_ids, request
+        )
+        for row in rows
+    ]
@@ -1,6 +1,9 @@
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Ingredient, Recipe
+from recipes.search import search_recipes
+
+from .tag_catalog import tag_catalog
 
 
 class IngredientFilter(FilterSet):
@@ -12,20 +15,41 @@ class IngredientFilter(FilterSet):
 
 
 class RecipeFilter(FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
+    tags = filters.MultipleChoiceFilter(
         field_name="tags__slug",
-        to_field_name="slug",
-        queryset=Tag.objects.all(),
+        # Связанный метод копировался бы вместе со справочником при
+        # копировании фильтров набора, поэтому передается функция.
+        choices=lambda: tag_catalog.choices(),
         label="Tags",
+        method="filter_tags",
     )
     is_favorited = filters.BooleanFilter(method="filter_is_favorited")
     is_in_shopping_cart = filters.BooleanFilter(
         method="filter_is_in_shopping_cart"
     )
+    search = filters.CharFilter(method="filter_search")
 
     class Meta:
         model = Recipe
-        fields = ("tags", "author", "is_favorited", "is_in_shopping_cart")
+        fields = (
+            "tags",
+            "author",
+            "is_favorited",
+            "is_in_shopping_cart",
+            "search",
+        )
+
+    def __init__(self, data=None, *args, **kwargs):
+        super().__init__(data, *args, **kwargs)
+        if data is not None:
+            # Неизвестный тег мог появиться в другом процессе: справочник
+            # перезагружается до проверки значений фильтра.
+            tag_catalog.choices(data.getlist("tags"))
+
+    def filter_tags(self, queryset, name, value):
+        return queryset.with_any_tags(
+            tag_catalog.mask(value), tag_catalog.combined_mask
+        )
 
     def filter_is_favorited(self, queryset, name, value):
         user = (
@@ -42,3 +66,6 @@ class RecipeFilter(FilterSet):
         if value and user:
             return queryset.filter(shopping_list__user_id=user.id)
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
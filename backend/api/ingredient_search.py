@@ -0,0 +1,166 @@
+import abc
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+import numpy as np
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+
+from foodgram import constants
+from recipes.models import Ingredient
+
+from .cache import INGREDIENTS_VERSION, get_version
+
+PREFIX_UPPER_BOUND = chr(0x10FFFF)
+WORD_RE = re.compile(r"\w+")
+
+
+def trigrams(text):
+    """Разбивает текст на триграммы так же, как расширение pg_trgm."""
+    grams = set()
+    for word in WORD_RE.findall(text.casefold()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class IngredientCatalogIndex(abc.ABC):
+    """Базовый индекс справочника ингредиентов в памяти процесса.
+
+    Справочник загружается при первом обращении и перезагружается, когда
+    меняется версия каталога ингредиентов в общем кеше. Новые данные
+    индекса подменяют старые одним присваиванием под блокировкой.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+
+    def refresh(self):
+        version = get_version(INGREDIENTS_VERSION)
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            self.data = self.build(
+                Ingredient.objects.values_list(
+                    "id", "name", "measurement_unit"
+                )
+            )
+            self.version = version
+
+    @abc.abstractmethod
+    def build(self, rows):
+        """Возвращает данные индекса, собранные из строк справочника."""
+
+    @abc.abstractmethod
+    def lookup(self, data, query, limit):
+        """Ищет ингредиенты в данных индекса."""
+
+    def search(self, query, limit):
+        self.refresh()
+        return self.lookup(self.data, query, limit)
+
+
+class IngredientPrefixIndex(IngredientCatalogIndex):
+    """Индекс ингредиентов по префиксу названия."""
+
+    def build(self, rows):
+        rows = sorted(
+            (name.casefold(), pk, name, measurement_unit)
+            for pk, name, measurement_unit in rows
+        )
+        keys = [row[0] for row in rows]
+        items = [
+            {"id": pk, "name": name, "measurement_unit": measurement_unit}
+            for _, pk, name, measurement_unit in rows
+        ]
+        return keys, items
+
+    def lookup(self, data, prefix, limit):
+        """Возвращает ингредиенты, название которых начинается с префикса.
+
+        Точное совпадение всегда идет первым, так как в отсортированном
+        индексе оно меньше любого другого названия с тем же префиксом.
+        """
+        keys, items = data
+        prefix = prefix.casefold()
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + PREFIX_UPPER_BOUND, lo=start)
+        if limit is not None:
+            end = min(end, start + limit)
+        return items[start:end]
+
+
+class IngredientTrigramIndex(IngredientCatalogIndex):
+    """Инвертированный индекс триграмм названий ингредиентов.
+
+    Сходство считается как в pg_trgm: отношение числа общих триграмм к
+    размеру их объединения.
+    """
+
+    def build(self, rows):
+        items = []
+        sizes = []
+        postings = defaultdict(list)
+        for position, (pk, name, measurement_unit) in enumerate(rows):
+            grams = trigrams(name)
+            items.append(
+                {"id": pk, "name": name, "measurement_unit": measurement_unit}
+            )
+            sizes.append(len(grams))
+            for gram in grams:
+                postings[gram].append(position)
+        return (
+            items,
+            np.array(sizes, dtype=np.int32),
+            {
+                gram: np.array(positions, dtype=np.int32)
+                for gram, positions in postings.items()
+            },
+        )
+
+    def lookup(
+        self, data, query, limit,
+        threshold=constants.INGREDIENT_SIMILARITY_MIN,
+    ):
+        """Возвращает ингредиенты, наиболее похожие на запрос."""
+        items, sizes, index = data
+        grams = trigrams(query)
+        postings = [index[gram] for gram in grams if gram in index]
+        if not postings:
+            return []
+        shared = np.bincount(np.concatenate(postings), minlength=len(items))
+        similarity = shared / (len(grams) + sizes - shared)
+        positions = np.flatnonzero(similarity >= threshold)
+        ranked = sorted(
+            positions.tolist(),
+            key=lambda position: (
+                -similarity[position],
+                items[position]["name"],
+            ),
+        )
+        return [items[position] for position in ranked[:limit]]
+
+
+ingredient_prefix_index = IngredientPrefixIndex()
+ingredient_trigram_index = IngredientTrigramIndex()
+
+
+def search_ingredients(query, limit):
+    """Нечеткий поиск ингредиентов по триграммам названия.
+
+    В PostgreSQL используется pg_trgm и GIN-индекс, в остальных базах
+    данных — индекс триграмм в памяти процесса.
+    """
+    if connection.vendor != "postgresql":
+        return ingredient_trigram_index.search(query, limit)
+    return list(
+        Ingredient.objects.filter(name__trigram_similar=query)
+        .annotate(similarity=TrigramSimilarity("name", query))
+        .order_by("-similarity", "name")
+        .values("id", "name", "measurement_unit")[:limit]
+    )
@@ -0,0 +1,83 @@
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.ingredient_search import IngredientTrigramIndex
+from foodgram import constants
+
+ALPHABET = "абвгдеёжзийклмнопрстуфхцчшщъыьэюя"
+
+
+def make_catalog(names, size, rng):
+    """Строит синтетический справочник из реальных названий."""
+    rows = []
+    for pk in range(size):
+        name = names[pk % len(names)]
+        if pk >= len(names):
+            name = f"{name} {rng.choice(names).split()[0]} {pk}"
+        rows.append((pk, name, "г"))
+    return rows
+
+
+def make_typo(name, rng):
+    position = rng.randrange(len(name))
+    operation = rng.choice(("replace", "delete", "insert"))
+    if operation == "replace":
+        return name[:position] + rng.choice(ALPHABET) + name[position + 1:]
+    if operation == "delete" and len(name) > 1:
+        return name[:position] + name[position + 1:]
+    return name[:position] + rng.choice(ALPHABET) + name[position:]
+
+
+class Command(BaseCommand):
+    help = "Измеряет задержку нечеткого поиска ингредиентов."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=(1000, 10000, 100000),
+            help="Размеры справочника.",
+        )
+        parser.add_argument(
+            "--queries",
+            type=int,
+            default=1000,
+            help="Количество запросов для каждого размера.",
+        )
+        parser.add_argument(
+            "--file",
+            default="data/ingredients.json",
+            help="Файл с реальными названиями ингредиентов.",
+        )
+
+    def handle(self, *args, **options):
+        with open(options["file"], "r") as file:
+            names = [item["name"] for item in json.load(file)]
+        rng = random.Random(0)
+        for size in options["sizes"]:
+            rows = make_catalog(names, size, rng)
+            index = IngredientTrigramIndex()
+            started = time.perf_counter()
+            data = index.build(rows)
+            build_time = time.perf_counter() - started
+            queries = [
+                make_typo(rng.choice(rows)[1].split()[0], rng)
+                for _ in range(options["queries"])
+            ]
+            timings = []
+            for query in queries:
+                started = time.perf_counter()
+                index.lookup(data, query, constants.INGREDIENT_SEARCH_LIMIT)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            self.stdout.write(
+                f"{size}: построение {build_time:.2f} с, "
+                f"p50 {statistics.median(timings):.2f} мс, "
+                f"p99 {timings[int(len(timings) * 0.99) - 1]:.2f} мс, "
+                f"max {timings[-1]:.2f} мс"
+            )
@@ -0,0 +1,73 @@
+import io
+import timeit
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from recipes.models import Recipe
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.parsers import FastJSONParser
+from api.renderers import FastJSONRenderer
+from api.representations import RECIPE_ROW_FIELDS, render_recipe_rows
+from foodgram import constants
+
+
+class Command(BaseCommand):
+    help = "Сравнивает скорость JSON-рендереров и парсеров на рецептах."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=constants.PAGE_SIZE,
+            help="Количество рецептов на странице.",
+        )
+        parser.add_argument(
+            "--number",
+            type=int,
+            default=1000,
+            help="Количество повторов для каждого замера.",
+        )
+
+    def handle(self, *args, **options):
+        rows = Recipe.objects.with_user_flags(AnonymousUser()).values(
+            *RECIPE_ROW_FIELDS
+        )[:options["limit"]]
+        results = render_recipe_rows(rows, request=None)
+        if not results:
+            raise CommandError("Нет рецептов для замера.")
+        page = {
+            "count": len(results),
+            "next": None,
+            "previous": None,
+            "results": results,
+        }
+        body = JSONRenderer().render(page)
+        if FastJSONRenderer().render(page) != body:
+            raise CommandError("Рендереры вернули разный JSON.")
+        self.stdout.write(
+            f"Рецептов: {len(results)}, размер ответа: {len(body)} байт"
+        )
+        number = options["number"]
+        self.report(
+            "render",
+            number,
+            lambda: JSONRenderer().render(page),
+            lambda: FastJSONRenderer().render(page),
+        )
+        self.report(
+            "parse",
+            number,
+            lambda: JSONParser().parse(io.BytesIO(body)),
+            lambda: FastJSONParser().parse(io.BytesIO(body)),
+        )
+
+    def report(self, name, number, baseline, candidate):
+        baseline_time = timeit.timeit(baseline, number=number) / number
+        candidate_time = timeit.timeit(candidate, number=number) / number
+        self.stdout.write(
+            f"{name}: json {baseline_time * 1e6:.1f} мкс, "
+            f"fast {candidate_time * 1e6:.1f} мкс, "
+            f"ускорение x{baseline_time / candidate_time:.1f}"
+        )
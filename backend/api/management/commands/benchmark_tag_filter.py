@@ -0,0 +1,130 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from foodgram import constants
+from recipes.models import Recipe, Tag
+
+User = get_user_model()
+
+
+def measure(function, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает фильтрацию рецептов по тегам через соединение "
+        "и через битовую маску. Данные создаются во временной транзакции "
+        "и откатываются после замеров."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--recipes",
+            type=int,
+            default=1_000_000,
+            help="Количество синтетических рецептов.",
+        )
+        parser.add_argument(
+            "--runs",
+            type=int,
+            default=10,
+            help="Количество повторов каждого запроса.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10_000,
+            help="Размер пакета при создании рецептов.",
+        )
+        parser.add_argument(
+            "--explain",
+            action="store_true",
+            help="Показать планы запросов.",
+        )
+
+    def handle(self, *args, **options):
+        tags = list(Tag.objects.order_by("id"))
+        if len(tags) < 2:
+            raise CommandError("Для замеров нужно хотя бы два тега.")
+        with transaction.atomic():
+            self.fill(tags, options["recipes"], options["batch_size"])
+            for selected in (tags[:1], tags[:2], tags[:-1]):
+                self.compare(selected, options["runs"], options["explain"])
+            transaction.set_rollback(True)
+
+    def fill(self, tags, total, batch_size):
+        rng = random.Random(0)
+        author = User.objects.create_user(
+            username="benchmark_tag_filter",
+            email="benchmark_tag_filter@example.com",
+            password=None,
+        )
+        through = Recipe.tags.through
+        started = time.perf_counter()
+        for start in range(0, total, batch_size):
+            size = min(batch_size, total - start)
+            recipe_tags = [
+                rng.sample(tags, rng.randint(1, min(3, len(tags))))
+                for _ in range(size)
+            ]
+            recipes = Recipe.objects.bulk_create(
+                Recipe(
+                    author=author,
+                    name=f"Рецепт {start + offset}",
+                    text="Описание",
+                    image="recipes/benchmark.png",
+                    cooking_time=constants.COOKING_TIME_MIN,
+                    tag_mask=sum(tag.mask for tag in selected),
+                )
+                for offset, selected in enumerate(recipe_tags)
+            )
+            through.objects.bulk_create(
+                through(recipe_id=recipe.pk, tag_id=tag.pk)
+                for recipe, selected in zip(recipes, recipe_tags)
+                for tag in selected
+            )
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"ANALYZE {Recipe._meta.db_table}, "
+                    f"{through._meta.db_table}"
+                )
+        self.stdout.write(
+            f"Создано рецептов: {total} "
+            f"за {time.perf_counter() - started:.1f} с"
+        )
+
+    def compare(self, selected, runs, explain):
+        slugs = [tag.slug for tag in selected]
+        plans = {
+            "соединение": Recipe.objects.filter(
+                tags__slug__in=slugs
+            ).distinct(),
+            "маска": Recipe.objects.with_any_tags(
+                sum(tag.mask for tag in selected)
+            ),
+        }
+        self.stdout.write(f"Теги: {', '.join(slugs)}")
+        for name, queryset in plans.items():
+            page = queryset.order_by("-id").values_list("id", flat=True)[
+                :constants.PAGE_SIZE
+            ]
+            page_time = measure(lambda: list(page.all()), runs)
+            count_time = measure(queryset.count, runs)
+            self.stdout.write(
+                f"  {name}: страница {page_time:.1f} мс, "
+                f"количество {count_time:.1f} мс"
+            )
+            if explain:
+                self.stdout.write(page.explain())
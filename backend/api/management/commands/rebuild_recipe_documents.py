@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from recipes.models import Recipe, RecipeDocument
+
+from api.documents import (
+    iter_recipe_id_batches,
+    rebuild_recipe_documents,
+    serialize_recipe_documents,
+)
+
+
+class Command(BaseCommand):
+    help = "Пересобирает документы рецептов или сверяет их с сериализатором."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Только сравнить сохраненные документы с сериализатором.",
+        )
+
+    def handle(self, *args, **options):
+        if options["verify"]:
+            self.verify()
+            return
+        total = 0
+        for recipe_ids in iter_recipe_id_batches(Recipe.objects.all()):
+            total += len(rebuild_recipe_documents(recipe_ids))
+        self.stdout.write(f"Пересобрано документов: {total}")
+
+    def verify(self):
+        missing, stale = [], []
+        for recipe_ids in iter_recipe_id_batches(Recipe.objects.all()):
+            stored = dict(
+                RecipeDocument.objects.filter(
+                    recipe_id__in=recipe_ids
+                ).values_list("recipe_id", "data")
+            )
+            live = serialize_recipe_documents(
+                Recipe.objects.filter(pk__in=recipe_ids)
+            )
+            for recipe_id, document in live.items():
+                if recipe_id not in stored:
+                    missing.append(recipe_id)
+                elif stored[recipe_id] != document:
+                    stale.append(recipe_id)
+        if missing or stale:
+            raise CommandError(
+                f"Отсутствуют документы рецептов: {missing}; "
+                f"устаревшие документы: {stale}"
+            )
+        self.stdout.write("Документы рецептов совпадают с сериализатором.")
@@ -1,8 +1,119 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 from foodgram import constants
 
 
+class CachedCountPaginator(Paginator):
+    """Пагинатор с кешируемым и оценочным количеством объектов.
+
+    Количество кешируется на ``PAGINATION_COUNT_CACHE_TIMEOUT`` секунд
+    для каждой комбинации фильтров и версии данных ``count_version``.
+    Для таблиц PostgreSQL без фильтров, размер которых превышает
+    ``PAGINATION_COUNT_ESTIMATE_THRESHOLD``, используется оценка
+    планировщика вместо ``COUNT(*)``.
+    """
+
+    def __init__(self, *args, count_version=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count_version = count_version
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return super().count
+        try:
+            sql, params = (
+                queryset.order_by().values("pk").query.sql_with_params()
+            )
+        except EmptyResultSet:
+            return 0
+        key = "{}:{}".format(
+            constants.PAGINATION_COUNT_CACHE_PREFIX,
+            hashlib.md5(
+                f"{queryset.db}:{sql}:{params}:{self.count_version}".encode()
+            ).hexdigest(),
+        )
+        count = cache.get(key)
+        if count is None:
+            count = self.estimate_count(queryset)
+            if count is None:
+                count = queryset.count()
+            cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+    @staticmethod
+    def estimate_count(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql" or queryset.query.has_filters():
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class "
+                "WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        threshold = settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD
+        if row is None or row[0] < threshold:
+            return None
+        return row[0]
+
+
+class CustomCursorPagination(CursorPagination):
+    page_size_query_param = "limit"
+    page_size = constants.PAGE_SIZE
+    ordering = "-id"
+
+
 class CustomLimitPagination(PageNumberPagination):
+    """Постраничная пагинация с переключением в режим курсора.
+
+    Режим курсора включается параметром ``pagination=cursor`` только для
+    действий, перечисленных в ``cursor_pagination_actions`` представления.
+    Если у представления есть метод ``get_count_version``, кешированное
+    количество объектов сбрасывается при смене возвращаемой им версии.
+    """
+
+    paginator_class = CachedCountPaginator
     page_size_query_param = "limit"
     page_size = constants.PAGE_SIZE
+    cursor_pagination_class = CustomCursorPagination
+    cursor_paginator = None
+    count_version = None
+
+    def django_paginator_class(self, object_list, per_page):
+        return self.paginator_class(
+            object_list, per_page, count_version=self.count_version
+        )
+
+    def use_cursor(self, request, view):
+        return request.query_params.get(
+            constants.PAGINATION_MODE_QUERY_PARAM
+        ) == constants.PAGINATION_MODE_CURSOR and view.action in getattr(
+            view, "cursor_pagination_actions", ()
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if view is not None and self.use_cursor(request, view):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        if hasattr(view, "get_count_version"):
+            self.count_version = view.get_count_version()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,43 @@
+from fpdf import FPDF
+from fpdf.enums import XPos, YPos
+
+MARGIN = 50
+FONT_FAMILY = "ShoppingList"
+FONT_SIZE = 12
+TITLE_FONT_SIZE = 16
+LEADING = 18
+
+
+class TextDocument(FPDF):
+    """PDF-документ из строк текста со встроенным шрифтом TrueType.
+
+    В документ встраивается только подмножество глифов шрифта, которые
+    встретились в тексте, поэтому кириллица отображается независимо от
+    шрифтов программы просмотра.
+    """
+
+    def __init__(self, font_path):
+        super().__init__(unit="pt", format="A4")
+        self.set_margins(MARGIN, MARGIN)
+        self.set_auto_page_break(True, MARGIN)
+        self.add_font(FONT_FAMILY, fname=font_path)
+
+    def write_lines(self, lines, title):
+        """Пишет заголовок и строки, перенося их по ширине страницы."""
+        self.add_page()
+        self.set_font(FONT_FAMILY, size=TITLE_FONT_SIZE)
+        self.write_line(title)
+        self.set_font_size(FONT_SIZE)
+        for line in lines:
+            self.write_line(line)
+
+    def write_line(self, text):
+        self.multi_cell(
+            0, LEADING, text, new_x=XPos.LMARGIN, new_y=YPos.NEXT
+        )
+
+    def iter_output(self, chunk_size):
+        """Отдает готовый документ частями по ``chunk_size`` байт."""
+        data = self.output()
+        for start in range(0, len(data), chunk_size):
+            yield bytes(data[start:start + chunk_size])
@@ -0,0 +1,166 @@
+import datetime
+import threading
+
+import numpy as np
+from django.utils import timezone
+
+from foodgram import constants
+from recipes.models import Recipe
+
+from .cache import RECIPE_LIST_VERSION, get_version
+
+EMPTY_POSITIONS = np.empty(0, dtype=np.int32)
+
+
+class RecipeCoverageIndex:
+    """Инвертированный индекс «ингредиент → рецепты» в памяти процесса.
+
+    Каждому рецепту присваивается позиция, а для каждого ингредиента
+    хранится отсортированный массив позиций рецептов, в которых он
+    используется. Когда меняется версия списка рецептов, из базы данных
+    загружаются только рецепты, измененные с момента прошлой
+    синхронизации; удаленные рецепты помечаются пустыми позициями.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.synced_at = None
+        self.clear()
+
+    def clear(self):
+        self.positions = {}
+        self.recipe_ids = np.empty(0, dtype=np.int64)
+        self.sizes = np.empty(0, dtype=np.int32)
+        self.recipe_ingredients = {}
+        self.postings = {}
+
+    def refresh(self):
+        version = get_version(RECIPE_LIST_VERSION)
+        if version == self.version:
+            return
+        started_at = timezone.now()
+        if self.synced_at is None or self.has_too_many_gaps():
+            self.clear()
+            self.update(Recipe.objects.all())
+        else:
+            self.update(
+                Recipe.objects.filter(
+                    updated_at__gte=self.synced_at
+                    - datetime.timedelta(
+                        seconds=constants.RECIPE_COVERAGE_SYNC_OVERLAP
+                    )
+                )
+            )
+            if len(self.positions) > Recipe.objects.count():
+                live_ids = set(Recipe.objects.values_list("id", flat=True))
+                for recipe_id in set(self.positions) - live_ids:
+                    self.remove(recipe_id)
+        self.synced_at = started_at
+        self.version = version
+
+    def has_too_many_gaps(self):
+        return len(self.sizes) > 2 * len(self.positions) + 1000
+
+    def update(self, queryset):
+        recipes = {}
+        for recipe_id, ingredient_id in queryset.order_by().values_list(
+            "id", "ingredient_list__ingredient_id"
+        ):
+            ingredients = recipes.setdefault(recipe_id, set())
+            if ingredient_id is not None:
+                ingredients.add(ingredient_id)
+        new_ids = [
+            recipe_id for recipe_id in recipes
+            if recipe_id not in self.positions
+        ]
+        if new_ids:
+            start = len(self.recipe_ids)
+            self.positions.update(
+                (recipe_id, start + offset)
+                for offset, recipe_id in enumerate(new_ids)
+            )
+            self.recipe_ids = np.concatenate(
+                (self.recipe_ids, np.array(new_ids, dtype=np.int64))
+            )
+            self.sizes = np.concatenate(
+                (self.sizes, np.zeros(len(new_ids), dtype=np.int32))
+            )
+        added = {}
+        removed = {}
+        for recipe_id, ingredients in recipes.items():
+            position = self.positions[recipe_id]
+            old = self.recipe_ingredients.get(recipe_id, frozenset())
+            for ingredient_id in ingredients - old:
+                added.setdefault(ingredient_id, []).append(position)
+            for ingredient_id in old - ingredients:
+                removed.setdefault(ingredient_id, []).append(position)
+            self.recipe_ingredients[recipe_id] = frozenset(ingredients)
+            self.sizes[position] = len(ingredients)
+        self.apply(added, removed)
+
+    def remove(self, recipe_id):
+        position = self.positions.pop(recipe_id)
+        self.apply(
+            {},
+            {
+                ingredient_id: [position]
+                for ingredient_id in self.recipe_ingredients.pop(recipe_id)
+            },
+        )
+        self.sizes[position] = 0
+
+    def apply(self, added, removed):
+        """Обновляет массивы позиций затронутых ингредиентов."""
+        for ingredient_id in added.keys() | removed.keys():
+            positions = self.postings.get(ingredient_id, EMPTY_POSITIONS)
+            if ingredient_id in removed:
+                positions = np.setdiff1d(
+                    positions,
+                    np.array(removed[ingredient_id], dtype=np.int32),
+                    assume_unique=True,
+                )
+            if ingredient_id in added:
+                positions = np.union1d(
+                    positions, np.array(added[ingredient_id], dtype=np.int32)
+                ).astype(np.int32)
+            if len(positions):
+                self.postings[ingredient_id] = positions
+            else:
+                self.postings.pop(ingredient_id, None)
+
+    def lookup(self, ingredient_ids, max_missing=None):
+        """Возвращает пары (id рецепта, число недостающих ингредиентов).
+
+        Рецепты упорядочены по числу недостающих ингредиентов, затем по
+        убыванию id. Рецепты без единого доступного ингредиента в
+        результат не попадают.
+        """
+        postings = [
+            self.postings[ingredient_id]
+            for ingredient_id in set(ingredient_ids)
+            if ingredient_id in self.postings
+        ]
+        if not postings:
+            return []
+        matched = np.bincount(
+            np.concatenate(postings), minlength=len(self.sizes)
+        )
+        candidates = np.flatnonzero(matched)
+        missing = self.sizes[candidates] - matched[candidates]
+        if max_missing is not None:
+            keep = missing <= max_missing
+            candidates, missing = candidates[keep], missing[keep]
+        recipe_ids = self.recipe_ids[candidates]
+        order = np.lexsort((-recipe_ids, missing))
+        return list(
+            zip(recipe_ids[order].tolist(), missing[order].tolist())
+        )
+
+    def search(self, ingredient_ids, max_missing=None):
+        with self.lock:
+            self.refresh()
+            return self.lookup(ingredient_ids, max_missing)
+
+
+recipe_coverage_index = RecipeCoverageIndex()
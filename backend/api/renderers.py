@@ -0,0 +1,179 @@
+import csv
+import io
+import itertools
+import json
+
+from django.conf import settings
+from django.db.models.fields.files import FieldFile
+from foodgram import constants
+from fontTools.ttLib import TTLibError
+from fpdf.errors import FPDFException
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .pdf import TextDocument
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z if orjson is not None else 0
+)
+SHOPPING_LIST_TITLE = "Список покупок"
+SHOPPING_LIST_HEADER = ("Ингредиент", "Единица измерения", "Количество")
+
+
+class ShoppingListUnavailable(APIException):
+    default_detail = "Выгрузка списка покупок в этом формате недоступна."
+    default_code = "shopping_list_unavailable"
+
+
+def default(obj):
+    """Приводит типы проекта к JSON так же, как ``JSONEncoder`` DRF."""
+    if isinstance(obj, FieldFile):
+        return obj.url if obj else None
+    return JSONEncoder().default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSON-рендерер на базе orjson.
+
+    При отсутствии orjson, запросе форматированного вывода или данных,
+    которые orjson не поддерживает, используется стандартный рендерер.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or not self.compact
+            or self.ensure_ascii
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """Базовый рендерер выгрузки списка покупок.
+
+    Строки ``(название, единица измерения, количество)`` отдаются
+    потоком через ``stream``. Метод ``render`` используется только для
+    ответов с ошибками.
+    """
+
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, ensure_ascii=False).encode()
+
+    def iter_parts(self, rows):
+        raise NotImplementedError
+
+    def stream(self, rows):
+        """Склеивает части вывода в блоки около ``STREAM_CHUNK_SIZE``.
+
+        ``iter_parts`` вызывается сразу, поэтому ошибки подготовки
+        вывода возникают до начала потокового ответа.
+        """
+        return self.join_parts(self.iter_parts(rows))
+
+    def join_parts(self, parts):
+        chunk = []
+        size = 0
+        for part in parts:
+            if isinstance(part, str):
+                part = part.encode(self.charset)
+            chunk.append(part)
+            size += len(part)
+            if size >= constants.STREAM_CHUNK_SIZE:
+                yield b"".join(chunk)
+                chunk, size = [], 0
+        if chunk:
+            yield b"".join(chunk)
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = "text/plain"
+    format = "txt"
+
+    def iter_parts(self, rows):
+        separator = ""
+        for name, measurement_unit, amount in rows:
+            yield f"{separator}{name} - {amount} ({measurement_unit})"
+            separator = "\n"
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+    def iter_parts(self, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in itertools.chain([SHOPPING_LIST_HEADER], rows):
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+
+class ShoppingListJSONRenderer(ShoppingListRenderer):
+    media_type = "application/json"
+    format = "json"
+
+    def iter_parts(self, rows):
+        separator = "["
+        for name, measurement_unit, amount in rows:
+            yield separator + json.dumps(
+                {
+                    "name": name,
+                    "measurement_unit": measurement_unit,
+                    "amount": amount,
+                },
+                ensure_ascii=False,
+            )
+            separator = ","
+        yield "[]" if separator == "[" else "]"
+
+
+class ShoppingListPDFRenderer(ShoppingListRenderer):
+    media_type = "application/pdf"
+    format = "pdf"
+    charset = None
+
+    def iter_parts(self, rows):
+        try:
+            document = TextDocument(settings.SHOPPING_LIST_PDF_FONT)
+        except (OSError, TTLibError, FPDFException) as error:
+            raise ShoppingListUnavailable() from error
+        return self.render_document(document, rows)
+
+    @staticmethod
+    def render_document(document, rows):
+        """Собирает документ при запросе первой части и отдает частями."""
+        document.write_lines(
+            (
+                f"{name} - {amount} ({measurement_unit})"
+                for name, measurement_unit, amount in rows
+            ),
+            SHOPPING_LIST_TITLE,
+        )
+        yield from document.iter_output(constants.STREAM_CHUNK_SIZE)
+
+
+SHOPPING_LIST_RENDERERS = (
+    ShoppingListTextRenderer,
+    ShoppingListCSVRenderer,
+    ShoppingListJSONRenderer,
+    ShoppingListPDFRenderer,
+)
@@ -0,0 +1,169 @@
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from recipes.models import Recipe, RecipeIngredient
+
+from .tag_catalog import tag_catalog
+from .utils import get_subscribed_author_ids
+
+User = get_user_model()
+
+RECIPE_ROW_FIELDS = (
+    "id",
+    "name",
+    "image",
+    "text",
+    "cooking_time",
+    "author_id",
+    "is_favorited",
+    "is_in_shopping_cart",
+)
+
+
+def file_url(field, name, request):
+    """Повторяет вывод ``ImageField`` сериализатора для имени файла."""
+    if not name:
+        return None
+    url = field.storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def render_recipe_rows(rows, request):
+    """Собирает представления рецептов из строк ``values()`` без
+    сериализаторов.
+
+    Строки должны содержать поля ``RECIPE_ROW_FIELDS``. Результат совпадает
+    с выводом ``RecipeReadSerializer``, а связанные данные загружаются тремя
+    запросами на всю страницу.
+    """
+    rows = list(rows)
+    recipe_ids = [row["id"] for row in rows]
+
+    recipe_tags = list(
+        Recipe.tags.through.objects.filter(recipe_id__in=recipe_ids)
+        .order_by("tag_id")
+        .values_list("recipe_id", "tag_id")
+    )
+    tag_representations = tag_catalog.get_representations(
+        {tag_id for _, tag_id in recipe_tags}
+    )
+    tags = defaultdict(list)
+    for recipe_id, tag_id in recipe_tags:
+        tags[recipe_id].append(dict(tag_representations[tag_id]))
+
+    ingredients = defaultdict(list)
+    for recipe_id, ingredient_id, name, measurement_unit, amount in (
+        RecipeIngredient.objects.filter(recipe_id__in=recipe_ids).values_list(
+            "recipe_id",
+            "ingredient_id",
+            "ingredient__name",
+            "ingredient__measurement_unit",
+            "amount",
+        )
+    ):
+        ingredients[recipe_id].append(
+            {
+                "id": ingredient_id,
+                "name": name,
+                "measurement_unit": measurement_unit,
+                "amount": amount,
+            }
+        )
+
+    subscribed_ids = get_subscribed_author_ids(request)
+    authors = {
+        author_id: render_author(
+            author_id, email, username, first_name, last_name, avatar,
+            author_id in subscribed_ids, request,
+        )
+        for author_id, email, username, first_name, last_name, avatar in (
+            User.objects.filter(
+                pk__in={row["author_id"] for row in rows}
+            ).values_list(
+                "id", "email", "username", "first_name", "last_name", "avatar"
+            )
+        )
+    }
+
+    return [
+        render_recipe(
+            row, tags[row["id"]], authors[row["author_id"]],
+            ingredients[row["id"]], request,
+        )
+        for row in rows
+    ]
+
+
+def render_author(
+    pk, email, username, first_name, last_name, avatar, is_subscribed,
+    request,
+):
+    return {
+        "id": pk,
+        "email": email,
+        "username": username,
+        "first_name": first_name,
+        "last_name": last_name,
+        "is_subscribed": is_subscribed,
+        "avatar": file_url(User._meta.get_field("avatar"), avatar, request),
+    }
+
+
+def render_recipe(row, tags, author, ingredients, request):
+    return {
+        "id": row["id"],
+        "tags": tags,
+        "author": author,
+        "ingredients": ingredients,
+        "is_favorited": row["is_favorited"],
+        "is_in_shopping_cart": row["is_in_shopping_cart"],
+        "name": row["name"],
+        "image": file_url(
+            Recipe._meta.get_field("image"), row["image"], request
+        ),
+        "text": row["text"],
+        "cooking_time": row["cooking_time"],
+    }
+
+
+def render_written_recipe(recipe, tags, ingredients, ingredient_details):
+    """Собирает представление только что записанного рецепта без запросов.
+
+    ``ingredients`` — сохраненные строки ``RecipeIngredient``,
+    ``ingredient_details`` — названия и единицы измерения ингредиентов,
+    загруженные при проверке данных. Отметки пользователя не заполняются,
+    ссылки на файлы остаются относительными, как в документах рецептов.
+    """
+    author = recipe.author
+    tag_representations = tag_catalog.get_representations()
+    return render_recipe(
+        {
+            "id": recipe.pk,
+            "is_favorited": False,
+            "is_in_shopping_cart": False,
+            "name": recipe.name,
+            "image": recipe.image.name,
+            "text": recipe.text,
+            "cooking_time": recipe.cooking_time,
+        },
+        [
+            dict(tag_representations[tag.pk])
+            for tag in sorted(tags, key=lambda tag: tag.pk)
+        ],
+        render_author(
+            author.pk, author.email, author.username, author.first_name,
+            author.last_name, author.avatar.name, False, None,
+        ),
+        [
+            {
+                "id": row.ingredient_id,
+                "name": ingredient_details[row.ingredient_id][0],
+                "measurement_unit": ingredient_details[row.ingredient_id][1],
+                "amount": row.amount,
+            }
+            for row in sorted(ingredients, key=lambda row: -row.pk)
+        ],
+        None,
+    )
@@ -2,10 +2,13 @@ import base64
 
 from django.contrib.auth import get_user_model
 from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers
 from djoser.serializers import UserCreateSerializer, UserSerializer
 
 from recipes.models import (
+    RECIPE_READ_PREFETCHES,
     Favorite,
     Ingredient,
     Recipe,
@@ -13,10 +16,17 @@ from recipes.models import (
     ShoppingList,
     Tag,
 )
+from recipes.shopping_lists import change_recipe_in_shopping_lists
+from recipes.signals import recipe_ingredients_batch
+from recipes.similarity import update_recipe_signatures
 from users.models import Subscription
 from foodgram import constants
 
-from .utils import get_serializer_method_field_value
+from .tag_catalog import tag_catalog
+from .utils import (
+    get_serializer_method_field_value,
+    get_subscribed_author_ids,
+)
 
 User = get_user_model()
 
@@ -50,10 +60,7 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        request = self.context.get("request")
-        if request is None or request.user.is_anonymous:
-            return False
-        return request.user.follower.filter(author=obj).exists()
+        return obj.id in get_subscribed_author_ids(self.context.get("request"))
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):
@@ -85,6 +92,27 @@ class TagSerializer(serializers.ModelSerializer):
         model = Tag
         fields = ("id", "name", "slug")
 
+    def to_representation(self, instance):
+        representations = tag_catalog.get_representations((instance.pk,))
+        if instance.pk not in representations:
+            return super().to_representation(instance)
+        return dict(representations[instance.pk])
+
+
+class TagPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Поле тега, которое находит теги в справочнике процесса."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            tag = tag_catalog.get(int(data))
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if tag is None:
+            self.fail("does_not_exist", pk_value=data)
+        return tag
+
 
 class IngredientSerializer(serializers.ModelSerializer):
 
@@ -140,18 +168,22 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         )
 
     def get_is_favorited(self, recipe):
+        if hasattr(recipe, "is_favorited"):
+            return recipe.is_favorited
         return get_serializer_method_field_value(
             self.context, Favorite, recipe, "user_id", "recipe"
         )
 
     def get_is_in_shopping_cart(self, recipe):
+        if hasattr(recipe, "is_in_shopping_cart"):
+            return recipe.is_in_shopping_cart
         return get_serializer_method_field_value(
             self.context, ShoppingList, recipe, "user_id", "recipe"
         )
 
 
 class RecipeWriteSerializer(serializers.ModelSerializer):
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = TagPrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
         many=True,
         label="Tags",
@@ -187,10 +219,13 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Добавьте ингредиент")
 
         ingredient_ids = [ingredient["id"] for ingredient in value]
-        existing_ingredient_count = Ingredient.objects.filter(
-            id__in=ingredient_ids
-        ).count()
-        if existing_ingredient_count != len(ingredient_ids):
+        self.ingredient_details = {
+            pk: (name, measurement_unit)
+            for pk, name, measurement_unit in Ingredient.objects.filter(
+                id__in=ingredient_ids
+            ).values_list("id", "name", "measurement_unit")
+        }
+        if len(self.ingredient_details) != len(ingredient_ids):
             raise serializers.ValidationError(
                 "Один или несколько ингредиентов не существуют"
             )
@@ -205,6 +240,7 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         return value
 
     def to_representation(self, instance):
+        prefetch_related_objects([instance], *RECIPE_READ_PREFETCHES)
         serializer = RecipeReadSerializer(
             instance, context={"request": self.context.get("request")}
         )
@@ -214,71 +250,142 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         recipe.tags.set(tags)
 
     def create_ingredients(self, ingredients, recipe):
-        for ingredient_data in ingredients:
-            ingredient_id = ingredient_data["id"]
-            ingredient = Ingredient.objects.get(pk=ingredient_id)
-            amount = ingredient_data["amount"]
-            RecipeIngredient.objects.create(
-                ingredient=ingredient, recipe=recipe, amount=amount
+        return RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                ingredient_id=ingredient_data["id"],
+                recipe=recipe,
+                amount=ingredient_data["amount"],
             )
+            for ingredient_data in ingredients
+        )
+
+    def update_ingredients(self, ingredients, recipe):
+        """Приводит ингредиенты рецепта к новому списку.
+
+        Добавляются только новые ингредиенты, обновляются только
+        изменившиеся количества и удаляются только исключенные строки.
+        Изменения количеств переносятся в списки покупок с этим рецептом.
+        Возвращает все строки ингредиентов рецепта после записи.
+        """
+        amounts = {
+            ingredient_data["id"]: ingredient_data["amount"]
+            for ingredient_data in ingredients
+        }
+        existing = {
+            ingredient_id: (pk, amount)
+            for pk, ingredient_id, amount in RecipeIngredient.objects.filter(
+                recipe=recipe
+            ).values_list("pk", "ingredient_id", "amount")
+        }
+        removed = [
+            pk
+            for ingredient_id, (pk, _) in existing.items()
+            if ingredient_id not in amounts
+        ]
+        kept = [
+            RecipeIngredient(
+                pk=pk,
+                recipe=recipe,
+                ingredient_id=ingredient_id,
+                amount=amounts[ingredient_id],
+            )
+            for ingredient_id, (pk, _) in existing.items()
+            if ingredient_id in amounts
+        ]
+        changed = [
+            row for row in kept
+            if row.amount != existing[row.ingredient_id][1]
+        ]
+        if removed:
+            with recipe_ingredients_batch():
+                RecipeIngredient.objects.filter(pk__in=removed).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ("amount",))
+        change_recipe_in_shopping_lists(
+            recipe.pk,
+            {
+                ingredient_id: amounts.get(ingredient_id, 0)
+                - existing.get(ingredient_id, (None, 0))[1]
+                for ingredient_id in amounts.keys() | existing.keys()
+            },
+        )
+        return kept + self.create_ingredients(
+            (
+                ingredient_data
+                for ingredient_data in ingredients
+                if ingredient_data["id"] not in existing
+            ),
+            recipe,
+        )
 
+    @transaction.atomic(savepoint=False)
     def create(self, validated_data):
         ingredients = validated_data.pop("ingredients")
         tags = validated_data.pop("tags")
         user = self.context.get("request").user
         recipe = Recipe.objects.create(**validated_data, author=user)
         self.create_tags(tags, recipe)
-        self.create_ingredients(ingredients, recipe)
+        self.written_tags = tags
+        self.written_ingredients = self.create_ingredients(
+            ingredients, recipe
+        )
+        update_recipe_signatures([recipe.pk])
         return recipe
 
+    @transaction.atomic(savepoint=False)
     def update(self, instance, validated_data):
-        tags = validated_data.get("tags")
+        tags = validated_data.pop("tags", None)
         if tags is None:
             raise serializers.ValidationError({"tags": "Добавьте тег"})
-        ingredients = validated_data.get("ingredients")
+        ingredients = validated_data.pop("ingredients", None)
         if ingredients is None:
             raise serializers.ValidationError(
                 {"ingredients": "Добавьте ингридиент"}
             )
         instance.tags.set(tags)
-        RecipeIngredient.objects.filter(recipe=instance).delete()
-        self.create_ingredients(validated_data.pop("ingredients"), instance)
+        self.written_tags = tags
+        self.written_ingredients = self.update_ingredients(
+            ingredients, instance
+        )
+        update_recipe_signatures([instance.pk])
         return super().update(instance, validated_data)
 
 
-class ShortRecipeSerializer(serializers.ModelSerializer):
-    image = Base64ImageField()
+class BatchIdsSerializer(serializers.Serializer):
+    """Список id объектов для пакетной операции."""
 
-    class Meta:
-        model = Recipe
-        fields = ("id", "name", "image", "cooking_time")
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=constants.BATCH_MAX_IDS,
+    )
 
 
-class SubscriberCreateSerializer(serializers.ModelSerializer):
+class RecipeCoverageQuerySerializer(serializers.Serializer):
+    """Параметры подбора рецептов по имеющимся ингредиентам."""
 
-    class Meta:
-        model = Subscription
-        fields = ("id", "user", "author")
-        read_only_fields = ("id",)
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False
+    )
+    max_missing = serializers.IntegerField(min_value=0, required=False)
 
-    def validate(self, data):
-        request = self.context.get("request")
-        user = request.user
-        author = data.get("author")
 
-        if user == author:
-            raise serializers.ValidationError(
-                "Вы не можете подписаться на себя"
-            )
-        if Subscription.objects.filter(user=user, author=author).exists():
-            raise serializers.ValidationError(
-                "Вы уже подписаны на этого пользователя"
-            )
+class ShortRecipeSerializer(serializers.ModelSerializer):
+    image = Base64ImageField()
 
-        return data
+    class Meta:
+        model = Recipe
+        fields = ("id", "name", "image", "cooking_time")
 
-    def create(self, validated_data):
-        return Subscription.objects.create(**validated_data)
+
+def get_recipes_limit(request):
+    """Количество рецептов автора из параметра ``recipes_limit``."""
+    limit = request.GET.get("recipes_limit", constants.PAGE_SIZE)
+    return (
+        int(limit)
+        if isinstance(limit, str) and limit.isdigit()
+        else constants.PAGE_SIZE
+    )
 
 
 class SubscriberDetailSerializer(serializers.ModelSerializer):
@@ -307,64 +414,23 @@ class SubscriberDetailSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        user = self.context.get("request").user
-        return Subscription.objects.filter(
-            author=obj.author, user=user
-        ).exists()
+        request = self.context.get("request")
+        if request is not None and obj.user_id == request.user.pk:
+            return True
+        return obj.author_id in get_subscribed_author_ids(request)
 
     def get_recipes(self, obj):
-        request = self.context.get("request")
-        limit = request.GET.get("recipes_limit", constants.PAGE_SIZE)
-        limit = (
-            int(limit)
-            if isinstance(limit, str) and limit.isdigit()
-            else constants.PAGE_SIZE
-        )
+        """Рецепты автора, заранее выбранные в ``limited_recipes``.
 
+        Если рецепты не выбраны заранее, они загружаются отдельным
+        запросом.
+        """
+        request = self.context.get("request")
+        recipes = getattr(obj, "limited_recipes", None)
+        if recipes is None:
+            recipes = Recipe.objects.filter(author=obj.author)[
+                :get_recipes_limit(request)
+            ]
         return ShortRecipeSerializer(
-            Recipe.objects.filter(author=obj.author)[:limit],
-            many=True,
-            context={"request": request},
+            recipes, many=True, context={"request": request}
         ).data
-
-
-class ShoppingCartCreateSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = ShoppingList
-        fields = ("id", "user", "recipe")
-        read_only_fields = ("id",)
-
-    def validate(self, data):
-        user = self.context["request"].user
-        recipe = data.get("recipe")
-
-        if ShoppingList.objects.filter(user=user, recipe=recipe).exists():
-            raise serializers.ValidationError(
-                f'Рецепт "{recipe.name}" уже добавлен в список покупок.'
-            )
-
-        return data
-
-    def create(self, validated_data):
-        return ShoppingList.objects.create(**validated_data)
-
-
-class FavoriteCreateSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Favorite
-        fields = ("id", "user", "recipe")
-        read_only_fields = ("id",)
-
-    def validate(self, data):
-        user = self.context["request"].user
-        recipe = data.get("recipe")
-
-        if Favorite.objects.filter(user=user, recipe=recipe).exists():
-            raise serializers.ValidationError(
-                f'Рецепт "{recipe.name}" уже добавлен в избранное.'
-            )
-
-        return data
-
-    def create(self, validated_data):
-        return Favorite.objects.create(**validated_data)
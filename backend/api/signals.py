@@ -0,0 +1,182 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingList,
+    Tag,
+    catalog_bulk_created,
+)
+from recipes.shopping_lists import shopping_lists_changed
+from recipes.signals import (
+    in_recipe_ingredients_batch,
+    recipe_relations_saved,
+)
+from recipes.similarity import recipe_signatures_changed
+from users.models import Subscription
+
+from .cache import (
+    INGREDIENTS_VERSION,
+    RECIPE_LIST_VERSION,
+    RECIPE_SIGNATURES_VERSION,
+    RECIPES_VERSION,
+    TAGS_VERSION,
+    bump_version_on_commit,
+    cart_version,
+    recipe_version,
+    user_version,
+)
+from .documents import rebuild_recipe_documents, rebuild_recipe_documents_for
+
+User = get_user_model()
+
+USER_PUBLIC_FIELDS = frozenset(
+    ("email", "username", "first_name", "last_name", "avatar")
+)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    bump_version_on_commit(
+        recipe_version(instance.pk), RECIPE_LIST_VERSION
+    )
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    if in_recipe_ingredients_batch():
+        return
+    bump_version_on_commit(
+        recipe_version(instance.recipe_id), RECIPE_LIST_VERSION
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        bump_version_on_commit(
+            recipe_version(instance.pk), RECIPE_LIST_VERSION
+        )
+    else:
+        bump_version_on_commit(RECIPES_VERSION)
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    """Запоминает, меняются ли поля пользователя, видимые в рецептах."""
+    fields = USER_PUBLIC_FIELDS
+    if update_fields is not None:
+        fields = fields & set(update_fields)
+    instance.public_fields_changed = False
+    if instance._state.adding or not fields:
+        return
+    saved = User.objects.filter(pk=instance.pk).values(*fields).first()
+    instance.public_fields_changed = saved is None or any(
+        User._meta.get_field(field).get_prep_value(getattr(instance, field))
+        != value
+        for field, value in saved.items()
+    )
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, **kwargs):
+    if not created and instance.public_fields_changed:
+        bump_version_on_commit(RECIPES_VERSION)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, **kwargs):
+    bump_version_on_commit(RECIPES_VERSION)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tag_changed(sender, **kwargs):
+    bump_version_on_commit(RECIPES_VERSION, TAGS_VERSION)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    bump_version_on_commit(RECIPES_VERSION, INGREDIENTS_VERSION)
+
+
+@receiver(catalog_bulk_created, sender=Ingredient)
+def ingredients_bulk_created(sender, **kwargs):
+    bump_version_on_commit(INGREDIENTS_VERSION)
+
+
+@receiver(catalog_bulk_created, sender=Tag)
+def tags_bulk_created(sender, **kwargs):
+    bump_version_on_commit(TAGS_VERSION)
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingList)
+@receiver((post_save, post_delete), sender=Subscription)
+def user_marks_changed(sender, instance, **kwargs):
+    bump_version_on_commit(user_version(instance.user_id))
+
+
+@receiver(shopping_lists_changed)
+def shopping_lists_totals_changed(sender, user_ids, **kwargs):
+    if user_ids:
+        bump_version_on_commit(*map(cart_version, user_ids))
+
+
+@receiver(recipe_signatures_changed)
+def recipe_signatures_updated(sender, recipe_ids, **kwargs):
+    if recipe_ids:
+        bump_version_on_commit(RECIPE_SIGNATURES_VERSION)
+
+
+@receiver(recipe_relations_saved, sender=Recipe)
+def recipe_documents_changed(sender, instance, **kwargs):
+    rebuild_recipe_documents([instance.pk])
+
+
+@receiver(post_save, sender=User)
+def author_documents_changed(sender, instance, created, **kwargs):
+    if not created and instance.public_fields_changed:
+        rebuild_recipe_documents_for(Recipe.objects.filter(author=instance))
+
+
+@receiver(post_save, sender=Tag)
+def tag_documents_changed(sender, instance, created, **kwargs):
+    if not created:
+        rebuild_recipe_documents_for(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_documents_changed(sender, instance, created, **kwargs):
+    if not created:
+        rebuild_recipe_documents_for(
+            Recipe.objects.filter(ingredients=instance)
+        )
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def catalog_item_deleting(sender, instance, **kwargs):
+    lookup = "tags" if sender is Tag else "ingredients"
+    instance.document_recipe_ids = list(
+        Recipe.objects.filter(**{lookup: instance}).values_list(
+            "pk", flat=True
+        )
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def catalog_item_deleted(sender, instance, **kwargs):
+    rebuild_recipe_documents(getattr(instance, "document_recipe_ids", ()))
@@ -0,0 +1,65 @@
+from recipes.models import Tag
+
+from .cache import TAGS_VERSION, get_version
+
+
+class TagCatalog:
+    """Справочник тегов в памяти процесса.
+
+    Теги загружаются при первом обращении и перезагружаются, когда
+    меняется версия тегов в общем кеше, поэтому изменение тега в одном
+    процессе видно всем остальным.
+    """
+
+    def __init__(self):
+        self.version = None
+
+    def refresh(self, tag_ids=(), slugs=()):
+        """Перезагружает справочник, если изменилась версия тегов.
+
+        Справочник перезагружается и тогда, когда в нем нет какого-либо
+        из ``tag_ids`` или ``slugs``: версия могла смениться до фиксации
+        транзакции, создавшей тег.
+        """
+        version = get_version(TAGS_VERSION)
+        if (
+            version == self.version
+            and all(tag_id in self.by_id for tag_id in tag_ids)
+            and all(slug in self.by_slug for slug in slugs)
+        ):
+            return
+        tags = list(Tag.objects.order_by("id"))
+        self.tags = tags
+        self.by_id = {tag.pk: tag for tag in tags}
+        self.by_slug = {tag.slug: tag for tag in tags}
+        self.representations = {
+            tag.pk: {"id": tag.pk, "name": tag.name, "slug": tag.slug}
+            for tag in tags
+        }
+        self.combined_mask = sum(tag.mask for tag in tags)
+        self.version = version
+
+    def all(self):
+        self.refresh()
+        return self.tags
+
+    def get(self, pk):
+        self.refresh((pk,))
+        return self.by_id.get(pk)
+
+    def choices(self, slugs=()):
+        """Варианты значений фильтра по тегам."""
+        self.refresh(slugs=slugs)
+        return [(tag.slug, tag.name) for tag in self.tags]
+
+    def mask(self, slugs):
+        self.refresh(slugs=slugs)
+        return sum({self.by_slug[slug].mask for slug in slugs})
+
+    def get_representations(self, tag_ids=()):
+        """Возвращает представления тегов по id, как у ``TagSerializer``."""
+        self.refresh(tag_ids)
+        return self.representations
+
+
+tag_catalog = TagCatalog()
@@ -0,0 +1,555 @@
+import os
+import re
+import shutil
+import tempfile
+import unittest
+import zlib
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from fontTools.ttLib import TTFont
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import (
+    APIClient,
+    APIRequestFactory,
+    force_authenticate,
+)
+
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeSignature,
+    ShoppingList,
+    Tag,
+)
+from recipes.search import is_postgresql
+from recipes.similarity import update_recipe_signatures
+from users.models import Subscription, User
+
+from .cache import (
+    RECIPE_LIST_VERSION,
+    RECIPE_SIGNATURES_VERSION,
+    RECIPES_VERSION,
+    get_version,
+    user_version,
+)
+from .documents import render_recipe_documents
+from .renderers import FastJSONRenderer
+from .representations import RECIPE_ROW_FIELDS, render_recipe_rows
+from .serializers import RecipeReadSerializer
+from .tag_catalog import tag_catalog
+
+MEDIA_ROOT = tempfile.mkdtemp()
+IMAGE = (
+    "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA"
+    "DUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeTestCase(TestCase):
+    """Общие данные для тестов рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username="author",
+            email="author@example.com",
+            password="password",
+            first_name="Иван",
+            last_name="Иванов",
+        )
+        cls.breakfast, cls.lunch, cls.dinner = (
+            Tag.objects.create(name=name, slug=slug)
+            for name, slug in (
+                ("Завтрак", "breakfast"),
+                ("Обед", "lunch"),
+                ("Ужин", "dinner"),
+            )
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f"Ингредиент {index}", measurement_unit="г")
+            for index in range(30)
+        )
+        cls.ingredients = list(Ingredient.objects.order_by("id"))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = self.get_client(self.author)
+
+    @staticmethod
+    def get_client(user=None):
+        client = APIClient()
+        if user is not None:
+            token, _ = Token.objects.get_or_create(user=user)
+            client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        return client
+
+    def recipe_payload(self, tags, ingredients=3, amount=1, **fields):
+        """Данные рецепта; ``ingredients`` — число или срез ингредиентов."""
+        if isinstance(ingredients, int):
+            ingredients = slice(ingredients)
+        return {
+            "name": "Омлет",
+            "text": "Взбить яйца и обжарить.",
+            "cooking_time": 10,
+            "image": IMAGE,
+            "tags": [tag.pk for tag in tags],
+            "ingredients": [
+                {"id": ingredient.pk, "amount": index + amount}
+                for index, ingredient in enumerate(
+                    self.ingredients[ingredients]
+                )
+            ],
+            **fields,
+        }
+
+    def write(self, method, url, payload):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(
+                url, payload, format="json"
+            )
+        self.assertIn(response.status_code, (200, 201), response.content)
+        return response
+
+    def filtered_ids(self, *slugs):
+        response = self.get_client().get(
+            "/api/recipes/", [("tags", slug) for slug in slugs]
+        )
+        return [recipe["id"] for recipe in response.json()["results"]]
+
+
+class RecipeTagsTest(RecipeTestCase):
+
+    def test_update_replaces_tag_mask(self):
+        recipe_id = self.write(
+            "post",
+            "/api/recipes/",
+            self.recipe_payload([self.breakfast, self.lunch]),
+        ).json()["id"]
+        self.write(
+            "patch",
+            f"/api/recipes/{recipe_id}/",
+            self.recipe_payload([self.dinner]),
+        )
+        self.assertEqual(
+            Recipe.objects.get(pk=recipe_id).tag_mask, self.dinner.mask
+        )
+        self.assertEqual(self.filtered_ids("lunch"), [])
+        self.assertEqual(self.filtered_ids("dinner"), [recipe_id])
+
+
+class RecipeWriteQueriesTest(RecipeTestCase):
+    """Число запросов записи рецепта не зависит от числа ингредиентов."""
+
+    # На SQLite поисковый индекс обновляется двумя запросами вместо одного.
+    SEARCH_INDEX_QUERIES = 1 if is_postgresql() else 2
+    CREATE_QUERIES = 16 + SEARCH_INDEX_QUERIES
+    UPDATE_QUERIES = 27 + SEARCH_INDEX_QUERIES
+    INGREDIENT_COUNTS = (1, 5, 20)
+
+    def setUp(self):
+        super().setUp()
+        tag_catalog.refresh()
+
+    def assertWrittenLikeRead(self, response):
+        self.assertEqual(
+            response.json(),
+            self.client.get(
+                f"/api/recipes/{response.json()['id']}/"
+            ).json(),
+        )
+
+    def test_create(self):
+        for count in self.INGREDIENT_COUNTS:
+            with self.subTest(ingredients=count):
+                with self.assertNumQueries(self.CREATE_QUERIES):
+                    response = self.write(
+                        "post",
+                        "/api/recipes/",
+                        self.recipe_payload(
+                            [self.breakfast, self.lunch], count
+                        ),
+                    )
+                self.assertEqual(len(response.json()["ingredients"]), count)
+                self.assertWrittenLikeRead(response)
+
+    def test_update(self):
+        for count in self.INGREDIENT_COUNTS:
+            with self.subTest(ingredients=count):
+                recipe_id = self.write(
+                    "post",
+                    "/api/recipes/",
+                    self.recipe_payload(
+                        [self.breakfast, self.lunch], count + 1
+                    ),
+                ).json()["id"]
+                ShoppingList.objects.create(
+                    user=self.author, recipe_id=recipe_id
+                )
+                # Первый ингредиент удаляется, количества остальных
+                # меняются, а теги заменяются.
+                with self.assertNumQueries(self.UPDATE_QUERIES):
+                    response = self.write(
+                        "patch",
+                        f"/api/recipes/{recipe_id}/",
+                        self.recipe_payload(
+                            [self.dinner],
+                            slice(1, count + 1),
+                            amount=5,
+                            name="Новый омлет",
+                        ),
+                    )
+                self.assertEqual(len(response.json()["ingredients"]), count)
+                self.assertWrittenLikeRead(response)
+
+
+class CacheVersionTest(RecipeTestCase):
+
+    def test_versions_change_after_commit(self):
+        recipe = Recipe.objects.create(
+            author=self.author,
+            name="Омлет",
+            text="Взбить яйца и обжарить.",
+            cooking_time=10,
+        )
+        name = user_version(self.author.pk)
+        version = get_version(name)
+        with self.captureOnCommitCallbacks(execute=True):
+            Favorite.objects.create(user=self.author, recipe=recipe)
+            self.assertEqual(get_version(name), version)
+        self.assertNotEqual(get_version(name), version)
+
+    def test_user_saves_without_public_changes_keep_versions(self):
+        version = get_version(RECIPES_VERSION)
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.create_user(
+                username="reader", email="reader@example.com", password="p"
+            )
+            user.save()
+            self.author.save()
+            self.author.save(update_fields=["last_login"])
+        self.assertEqual(get_version(RECIPES_VERSION), version)
+        self.author.first_name = "Петр"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.save()
+        self.assertNotEqual(get_version(RECIPES_VERSION), version)
+
+    def test_list_etag_depends_on_query(self):
+        client = self.get_client()
+        etag = client.get("/api/recipes/", {"limit": 1})["ETag"]
+        for query, status_code in (({"limit": 1}, 304), ({"limit": 2}, 200)):
+            with self.subTest(query=query):
+                response = client.get(
+                    "/api/recipes/", query, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, status_code)
+        self.assertIn("Accept", response["Vary"])
+
+
+class RecipeSimilarityTest(RecipeTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.first_id, self.second_id = (
+            self.write(
+                "post", "/api/recipes/", self.recipe_payload([self.dinner])
+            ).json()["id"]
+            for _ in range(2)
+        )
+
+    def test_similar_does_not_write_missing_signature(self):
+        RecipeSignature.objects.filter(recipe_id=self.first_id).delete()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.get_client().get(
+                f"/api/recipes/{self.first_id}/similar/"
+            )
+        self.assertEqual(
+            [recipe["id"] for recipe in response.json()], [self.second_id]
+        )
+        self.assertEqual(callbacks, [])
+        self.assertFalse(
+            RecipeSignature.objects.filter(recipe_id=self.first_id).exists()
+        )
+
+    def test_unchanged_signatures_keep_versions(self):
+        versions = [
+            get_version(RECIPE_LIST_VERSION),
+            get_version(RECIPE_SIGNATURES_VERSION),
+        ]
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            update_recipe_signatures([self.first_id, self.second_id])
+        self.assertEqual(callbacks, [])
+        self.assertEqual(
+            [
+                get_version(RECIPE_LIST_VERSION),
+                get_version(RECIPE_SIGNATURES_VERSION),
+            ],
+            versions,
+        )
+
+
+class RecipeRepresentationTest(RecipeTestCase):
+    """Быстрые представления рецептов совпадают с сериализатором."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.reader = User.objects.create_user(
+            username="reader",
+            email="reader@example.com",
+            password="password",
+            first_name="Петр",
+            last_name="Петров",
+        )
+        User.objects.filter(pk=cls.author.pk).update(
+            avatar="users/avatar.png"
+        )
+        recipes = [
+            Recipe.objects.create(
+                author=cls.author if index % 2 else cls.reader,
+                name=f"Рецепт «{index}»",
+                text=f"Описание\nрецепта {index}",
+                cooking_time=index + 1,
+                image=f"recipes/image_{index}.png",
+            )
+            for index in range(4)
+        ]
+        tags = (cls.breakfast, cls.lunch, cls.dinner)
+        for index, recipe in enumerate(recipes):
+            recipe.tags.set(tags[:index % 3 + 1])
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=amount + 1
+                )
+                for amount, ingredient in enumerate(
+                    cls.ingredients[index:index + 3 + index]
+                )
+            )
+        Subscription.objects.create(user=cls.reader, author=cls.author)
+        Favorite.objects.create(user=cls.reader, recipe=recipes[0])
+        Favorite.objects.create(user=cls.reader, recipe=recipes[1])
+        ShoppingList.objects.create(user=cls.reader, recipe=recipes[1])
+        ShoppingList.objects.create(user=cls.reader, recipe=recipes[2])
+
+    def get_request(self, user=None):
+        request = APIRequestFactory().get("/api/recipes/")
+        if user is not None:
+            force_authenticate(request, user)
+        return Request(request)
+
+    def render(self, data):
+        return FastJSONRenderer().render(data)
+
+    def assertRenderedLikeSerializer(self, user):
+        request = self.get_request(user)
+        queryset = Recipe.objects.with_user_flags(request.user)
+        expected = self.render(
+            RecipeReadSerializer(
+                queryset.with_read_relations(),
+                many=True,
+                context={"request": request},
+            ).data
+        )
+        rows = queryset.values(*RECIPE_ROW_FIELDS)
+        self.assertEqual(
+            self.render(render_recipe_rows(rows, request)), expected
+        )
+        # Первый вызов собирает документы, второй читает сохраненные.
+        for _ in range(2):
+            self.assertEqual(
+                self.render(render_recipe_documents(rows, request)),
+                expected,
+            )
+
+    def test_anonymous(self):
+        self.assertRenderedLikeSerializer(None)
+
+    def test_authenticated(self):
+        self.assertRenderedLikeSerializer(self.reader)
+
+    def test_author(self):
+        self.assertRenderedLikeSerializer(self.author)
+
+
+def parse_pdf(data):
+    """Читает объекты PDF по таблице xref и проверяет смещения."""
+    startxref = int(data.rsplit(b"startxref", 1)[1].split()[0])
+    lines = data[startxref:].split(b"\n")
+    assert lines[0] == b"xref", lines[0]
+    count = int(lines[1].split()[1])
+    objects = {}
+    for object_id, entry in enumerate(lines[2:2 + count]):
+        if not object_id:
+            continue
+        offset = int(entry.split()[0])
+        header = b"%d 0 obj\n" % object_id
+        assert data.startswith(header, offset), object_id
+        body = data[offset + len(header):data.index(b"\nendobj", offset)]
+        objects[object_id] = body
+    return objects
+
+
+def stream_data(body):
+    length = int(re.search(rb"/Length (\d+)", body).group(1))
+    start = body.index(b"stream\n") + len(b"stream\n")
+    data = body[start:start + length]
+    if b"/FlateDecode" in body:
+        return zlib.decompress(data)
+    return data
+
+
+def unescape_pdf_string(data):
+    """Раскрывает экранирование в литеральной строке PDF."""
+    return re.sub(
+        rb"\\(.)",
+        lambda match: {b"r": b"\r", b"n": b"\n", b"t": b"\t"}.get(
+            match.group(1), match.group(1)
+        ),
+        data,
+        flags=re.DOTALL,
+    )
+
+
+@unittest.skipUnless(
+    os.path.exists(settings.SHOPPING_LIST_PDF_FONT),
+    "Шрифт для PDF не установлен",
+)
+class ShoppingListPDFTest(RecipeTestCase):
+
+    def test_pdf_embeds_font_with_cyrillic(self):
+        Ingredient.objects.filter(pk=self.ingredients[0].pk).update(
+            name="Мёд «Лесной»", measurement_unit="ст. л."
+        )
+        recipe_id = self.write(
+            "post", "/api/recipes/", self.recipe_payload([self.lunch])
+        ).json()["id"]
+        ShoppingList.objects.create(user=self.author, recipe_id=recipe_id)
+        response = self.client.get(
+            "/api/recipes/download_shopping_cart/", {"format": "pdf"}
+        )
+        self.assertEqual(response.status_code, 200)
+        data = b"".join(response.streaming_content)
+        self.assertTrue(data.startswith(b"%PDF-"))
+        self.assertTrue(data.endswith(b"%%EOF\n"))
+        objects = parse_pdf(data)
+
+        fonts = [body for body in objects.values() if b"/Type0" in body]
+        self.assertEqual(len(fonts), 1)
+        self.assertIn(b"/Encoding /Identity-H", fonts[0])
+        descriptor = next(
+            body for body in objects.values() if b"/FontFile2" in body
+        )
+        font_file_id = int(
+            re.search(rb"/FontFile2 (\d+) 0 R", descriptor).group(1)
+        )
+        subset = TTFont(BytesIO(stream_data(objects[font_file_id])))
+        original = TTFont(settings.SHOPPING_LIST_PDF_FONT, lazy=True)
+        self.assertLess(
+            subset["maxp"].numGlyphs, original["maxp"].numGlyphs // 10
+        )
+
+        to_unicode_id = int(
+            re.search(rb"/ToUnicode (\d+) 0 R", fonts[0]).group(1)
+        )
+        chars = {
+            int(glyph, 16): chr(int(char, 16))
+            for glyph, char in re.findall(
+                rb"<([0-9A-F]{4})> <([0-9A-F]{4})>",
+                stream_data(objects[to_unicode_id]),
+            )
+        }
+        text = [
+            "".join(
+                chars[int.from_bytes(code[index:index + 2], "big")]
+                for index in range(0, len(code), 2)
+            )
+            for body in objects.values()
+            if b"stream\n" in body and b"/Length1" not in body
+            for code in map(
+                unescape_pdf_string,
+                re.findall(
+                    rb"\(((?:\\.|[^\\)])*)\) Tj",
+                    stream_data(body),
+                    flags=re.DOTALL,
+                ),
+            )
+        ]
+        self.assertEqual(
+            text,
+            [
+                "Список покупок",
+                "Ингредиент 1 - 2 (г)",
+                "Ингредиент 2 - 3 (г)",
+                "Мёд «Лесной» - 1 (ст. л.)",
+            ],
+        )
+
+    @override_settings(SHOPPING_LIST_PDF_FONT="/nonexistent/font.ttf")
+    def test_missing_font_is_reported_before_streaming(self):
+        response = self.client.get(
+            "/api/recipes/download_shopping_cart/", {"format": "pdf"}
+        )
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(response.streaming)
+
+
+class IngredientCatalogTest(RecipeTestCase):
+
+    def test_bulk_created_ingredients_are_found(self):
+        client = self.get_client()
+        self.assertEqual(
+            client.get("/api/ingredients/", {"name": "Мёд"}).json(), []
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.bulk_create(
+                [Ingredient(name="Мёд", measurement_unit="г")]
+            )
+        self.assertEqual(
+            [
+                ingredient["name"]
+                for ingredient in client.get(
+                    "/api/ingredients/", {"name": "Мёд"}
+                ).json()
+            ],
+            ["Мёд"],
+        )
+
+
+class TagCatalogTest(RecipeTestCase):
+
+    def setUp(self):
+        super().setUp()
+        tag_catalog.refresh()
+
+    def test_bulk_created_tags_are_listed(self):
+        client = self.get_client()
+        self.assertEqual(len(client.get("/api/tags/").json()), 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.bulk_create([Tag(name="Перекус", slug="snack")])
+        self.assertEqual(
+            [tag["slug"] for tag in client.get("/api/tags/").json()],
+            ["breakfast", "lunch", "dinner", "snack"],
+        )
+
+    def test_unknown_slug_reloads_catalog(self):
+        # Версия тегов не меняется: транзакция не зафиксирована.
+        Tag.objects.bulk_create([Tag(name="Перекус", slug="snack")])
+        response = self.get_client().get("/api/recipes/", {"tags": "snack"})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(
+            self.get_client().get(
+                "/api/recipes/", {"tags": "missing"}
+            ).status_code,
+            400,
+        )
@@ -1,3 +1,11 @@
+from django.db import connections, router
+from django.db.models.signals import post_save
+
+from users.models import Subscription
+
+SUBSCRIBED_AUTHOR_IDS_ATTR = "_subscribed_author_ids"
+
+
 def get_serializer_method_field_value(
     context, model, obj, user_field, object_field
 ):
@@ -10,3 +18,122 @@ def get_serializer_method_field_value(
             }
         ).exists()
     )
+
+
+def get_subscribed_author_ids(request):
+    """Возвращает id авторов, на которых подписан пользователь запроса.
+
+    Множество вычисляется одним запросом и сохраняется в объекте запроса,
+    поэтому все вложенные сериализаторы ответа используют общий результат.
+    """
+    if request is None or request.user.is_anonymous:
+        return frozenset()
+    author_ids = getattr(request, SUBSCRIBED_AUTHOR_IDS_ATTR, None)
+    if author_ids is None:
+        author_ids = frozenset(
+            Subscription.objects.filter(user=request.user).values_list(
+                "author_id", flat=True
+            )
+        )
+        setattr(request, SUBSCRIBED_AUTHOR_IDS_ATTR, author_ids)
+    return author_ids
+
+
+def insert_ignoring_conflicts(model, objs):
+    """Добавляет строки одним запросом ``INSERT ... ON CONFLICT``.
+
+    Строки, нарушающие ограничения уникальности, пропускаются. Возвращает
+    созданные объекты из ``objs`` с заполненным первичным ключом.
+    Сигналы не отправляются.
+    """
+    objs = list(objs)
+    if not objs:
+        return []
+    using = router.db_for_write(model)
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not field.primary_key
+    ]
+    rows = [
+        tuple(
+            field.get_db_prep_save(field.pre_save(obj, True), connection)
+            for field in fields
+        )
+        for obj in objs
+    ]
+    objs_by_row = dict(zip(rows, objs))
+    columns = ", ".join(quote_name(field.column) for field in fields)
+    placeholders = "({})".format(", ".join(["%s"] * len(fields)))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO {} ({}) VALUES {} "
+            "ON CONFLICT DO NOTHING RETURNING {}, {}".format(
+                quote_name(model._meta.db_table),
+                columns,
+                ", ".join([placeholders] * len(objs_by_row)),
+                quote_name(model._meta.pk.column),
+                columns,
+            ),
+            [value for row in objs_by_row for value in row],
+        )
+        returned = cursor.fetchall()
+    created = []
+    for pk, *row in returned:
+        obj = objs_by_row[tuple(row)]
+        obj.pk = pk
+        obj._state.adding = False
+        obj._state.db = using
+        created.append(obj)
+    return created
+
+
+def delete_user_rows(model, user, field_name, values):
+    """Удаляет строки пользователя одним запросом ``DELETE ... RETURNING``.
+
+    Возвращает значения поля ``field_name`` удаленных строк. Сигналы не
+    отправляются.
+    """
+    values = list(values)
+    if not values:
+        return []
+    using = router.db_for_write(model)
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    user_column = quote_name(model._meta.get_field("user").column)
+    column = quote_name(model._meta.get_field(field_name).column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "DELETE FROM {} WHERE {} = %s AND {} IN ({}) RETURNING {}".format(
+                quote_name(model._meta.db_table),
+                user_column,
+                column,
+                ", ".join(["%s"] * len(values)),
+                column,
+            ),
+            [user.pk, *values],
+        )
+        return [value for value, in cursor.fetchall()]
+
+
+def create_if_absent(model, **values):
+    """Добавляет строку, если ее еще нет.
+
+    Возвращает созданный объект или ``None``, если такая строка уже
+    нарушает ограничение уникальности. Для созданного объекта
+    отправляется ``post_save``, как при обычном сохранении.
+    """
+    created = insert_ignoring_conflicts(model, [model(**values)])
+    if not created:
+        return None
+    instance = created[0]
+    post_save.send(
+        sender=model,
+        instance=instance,
+        created=True,
+        update_fields=None,
+        raw=False,
+        using=instance._state.db,
+    )
+    return instance
@@ -1,55 +1,184 @@
+import hashlib
+from collections import defaultdict
+
+from api.cache import (
+    INGREDIENTS_VERSION,
+    RECIPE_LIST_VERSION,
+    RECIPE_SIGNATURES_VERSION,
+    RECIPES_VERSION,
+    TAGS_VERSION,
+    anonymous_response_cache,
+    bump_version_on_commit,
+    cache_stream,
+    cart_version,
+    get_version,
+    recipe_version,
+    user_version,
+    version_to_datetime,
+)
+from api.conditional import conditional_get
+from api.documents import (
+    merge_recipe_document,
+    render_recipe_documents,
+    store_recipe_documents,
+    strip_user_flags,
+)
 from api.filters import IngredientFilter, RecipeFilter
+from api.ingredient_search import ingredient_prefix_index, search_ingredients
 from api.pagination import CustomLimitPagination
 from api.permissions import IsAdminAuthorOrReadOnly
+from api.recipe_coverage import recipe_coverage_index
+from api.renderers import SHOPPING_LIST_RENDERERS
+from api.representations import RECIPE_ROW_FIELDS, render_written_recipe
+from api.tag_catalog import tag_catalog
+from api.utils import (
+    create_if_absent,
+    delete_user_rows,
+    get_subscribed_author_ids,
+    insert_ignoring_conflicts,
+)
 from api.serializers import (
     AvatarSerializer,
+    BatchIdsSerializer,
     CustomUserSerializer,
     IngredientSerializer,
-    FavoriteCreateSerializer,
+    RecipeCoverageQuerySerializer,
     RecipeReadSerializer,
     RecipeWriteSerializer,
-    ShoppingCartCreateSerializer,
     ShortRecipeSerializer,
-    SubscriberCreateSerializer,
     SubscriberDetailSerializer,
     TagSerializer,
+    get_recipes_limit,
 )
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Sum
-from django.http import Http404, HttpResponse
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from django.views.decorators.http import require_GET
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
+from foodgram import constants
 from recipes.models import (
     Favorite,
     Ingredient,
     Recipe,
-    RecipeIngredient,
     ShoppingList,
+    ShoppingListIngredient,
     Tag,
 )
+from recipes.shopping_lists import change_shopping_list
+from recipes.similarity import find_similar_recipes
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404 as get_row_or_404
 from rest_framework.permissions import (
     AllowAny,
     IsAuthenticated,
     IsAuthenticatedOrReadOnly,
 )
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.validators import UniqueTogetherValidator
 from rest_framework.reverse import reverse
 from users.models import Subscription
 
 User = get_user_model()
 
 
+def non_field_error(message):
+    """Ответ 400 в формате ошибок ``validate()`` сериализатора."""
+    return Response(
+        {api_settings.NON_FIELD_ERRORS_KEY: [message]},
+        status=status.HTTP_400_BAD_REQUEST,
+    )
+
+
+def batch_user_marks(
+    request, model, target_model, field_name, excluded=(), on_change=None
+):
+    """Добавляет или удаляет отметки пользователя для списка объектов.
+
+    Существование объектов проверяется одним запросом, запись выполняется
+    одним запросом, а ответ содержит состояние каждого переданного id.
+    ``on_change(id пользователя, id объектов, знак)`` вызывается в той же
+    транзакции для фактически добавленных или удаленных отметок.
+    """
+    serializer = BatchIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    ids = list(dict.fromkeys(serializer.validated_data["ids"]))
+    found = set(
+        target_model.objects.filter(pk__in=ids)
+        .exclude(pk__in=excluded)
+        .values_list("pk", flat=True)
+    )
+    targets = [pk for pk in ids if pk in found]
+    attname = model._meta.get_field(field_name).attname
+    with transaction.atomic():
+        if request.method == "POST":
+            changed = {
+                getattr(row, attname)
+                for row in insert_ignoring_conflicts(
+                    model,
+                    (
+                        model(user=request.user, **{attname: pk})
+                        for pk in targets
+                    ),
+                )
+            }
+            statuses = ("created", "exists")
+        else:
+            changed = set(
+                delete_user_rows(model, request.user, field_name, targets)
+            )
+            statuses = ("deleted", "absent")
+        if changed and on_change is not None:
+            on_change(
+                request.user.pk, changed, 1 if request.method == "POST" else -1
+            )
+    if changed:
+        bump_version_on_commit(user_version(request.user.pk))
+    return Response(
+        [
+            {
+                "id": pk,
+                "status": (
+                    statuses[pk not in changed]
+                    if pk in found
+                    else "forbidden" if pk in excluded else "not_found"
+                ),
+            }
+            for pk in ids
+        ]
+    )
+
+
+def unique_together_error(*field_names):
+    """Ответ 400, который возвращает ``UniqueTogetherValidator``."""
+    return non_field_error(
+        UniqueTogetherValidator.message.format(
+            field_names=", ".join(field_names)
+        )
+    )
+
+
 class CustomUserViewSet(UserViewSet):
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
     pagination_class = CustomLimitPagination
+    cursor_pagination_actions = ("subscriptions",)
 
     @action(["get"], detail=False, permission_classes=(IsAuthenticated,))
+    @conditional_get(
+        lambda view: (
+            (view.request.user.pk, view.request.user.updated_at),
+            view.request.user.updated_at,
+        )
+    )
     def me(self, request, *args, **kwargs):
         self.get_object = self.get_instance
         return self.retrieve(request, *args, **kwargs)
@@ -75,6 +204,11 @@ class CustomUserViewSet(UserViewSet):
         user.avatar.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def get_count_version(self):
+        if self.action == "subscriptions":
+            return get_version(user_version(self.request.user.pk))
+        return None
+
     @action(
         detail=False,
         methods=("GET",),
@@ -83,19 +217,61 @@ class CustomUserViewSet(UserViewSet):
         url_name="subscriptions",
     )
     def subscriptions(self, request):
-        user = request.user
+        """Подписки пользователя с рецептами авторов.
+
+        Страница собирается постоянным числом запросов: количество
+        рецептов считается подзапросом, а первые ``recipes_limit`` рецептов
+        всех авторов страницы выбираются одним запросом с оконной функцией.
+        """
         queryset = (
-            Subscription.objects.filter(user=user)
+            Subscription.objects.filter(user=request.user)
             .select_related("author")
-            .prefetch_related("author__recipes")
-            .annotate(recipes_count=Count("author__recipes"))
+            .annotate(
+                recipes_count=Coalesce(
+                    Subquery(
+                        Recipe.objects.filter(author=OuterRef("author"))
+                        .order_by()
+                        .values("author")
+                        .annotate(count=Count("pk"))
+                        .values("count")
+                    ),
+                    0,
+                )
+            )
+            .order_by(*Subscription._meta.ordering)
         )
-        pages = self.paginate_queryset(queryset)
+        subscriptions = self.paginate_queryset(queryset)
+        recipes = defaultdict(list)
+        for recipe in (
+            Recipe.objects.filter(
+                author__in=[
+                    subscription.author_id for subscription in subscriptions
+                ]
+            )
+            .latest_per_author(get_recipes_limit(request))
+            .only("id", "name", "image", "cooking_time", "author_id")
+        ):
+            recipes[recipe.author_id].append(recipe)
+        for subscription in subscriptions:
+            subscription.limited_recipes = recipes[subscription.author_id]
         serializer = SubscriberDetailSerializer(
-            pages, many=True, context={"request": request}
+            subscriptions, many=True, context={"request": request}
         )
         return self.get_paginated_response(serializer.data)
 
+    @action(
+        detail=False,
+        methods=("post", "delete"),
+        permission_classes=(IsAuthenticated,),
+        url_path="subscribe",
+        url_name="subscribe-batch",
+    )
+    def subscribe_batch(self, request):
+        """Подписка на нескольких авторов или отписка от них."""
+        return batch_user_marks(
+            request, Subscription, User, "author", (request.user.pk,)
+        )
+
     @action(
         detail=True,
         methods=("post", "delete"),
@@ -105,26 +281,18 @@ class CustomUserViewSet(UserViewSet):
 
         if self.request.method == "POST":
             author = get_object_or_404(User, id=id)
-            data = {"user": user.id, "author": author.id}
-            serializer = SubscriberCreateSerializer(
-                data=data, context={"request": request}
+            if author == user:
+                return non_field_error("Вы не можете подписаться на себя")
+            subscription = create_if_absent(
+                Subscription, user=user, author=author
             )
-            if serializer.is_valid():
-                serializer.save()
-                queryset = (
-                    Subscription.objects.filter(id=serializer.instance.id)
-                    .annotate(recipes_count=Count("author__recipes"))
-                    .first()
-                )
-                serializer = SubscriberDetailSerializer(
-                    queryset, context={"request": request}
-                )
-                return Response(
-                    serializer.data, status=status.HTTP_201_CREATED
-                )
-            return Response(
-                serializer.errors, status=status.HTTP_400_BAD_REQUEST
+            if subscription is None:
+                return unique_together_error("user", "author")
+            subscription.recipes_count = author.recipes.count()
+            serializer = SubscriberDetailSerializer(
+                subscription, context={"request": request}
             )
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         elif request.method == "DELETE":
             if not User.objects.filter(id=id).exists():
@@ -143,12 +311,31 @@ class CustomUserViewSet(UserViewSet):
             return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+def get_catalog_validators(name):
+    version = get_version(name)
+    return version, version_to_datetime(version)
+
+
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = (IsAdminAuthorOrReadOnly,)
     pagination_class = None
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
 
+    @conditional_get(lambda view: get_catalog_validators(TAGS_VERSION))
+    def list(self, request, *args, **kwargs):
+        return Response(
+            self.get_serializer(tag_catalog.all(), many=True).data
+        )
+
+    @conditional_get(lambda view: get_catalog_validators(TAGS_VERSION))
+    def retrieve(self, request, *args, **kwargs):
+        pk = self.kwargs["pk"]
+        tag = tag_catalog.get(int(pk)) if pk.isdigit() else None
+        if tag is None:
+            raise Http404
+        return Response(self.get_serializer(tag).data)
+
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = (AllowAny,)
@@ -158,21 +345,252 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
     search_fields = ("^name",)
 
+    @conditional_get(
+        lambda view: get_catalog_validators(INGREDIENTS_VERSION)
+    )
+    def list(self, request, *args, **kwargs):
+        limit = request.query_params.get("limit", "")
+        limit = int(limit) if limit.isdigit() else None
+        search = request.query_params.get("search")
+        if search is not None:
+            return Response(
+                search_ingredients(
+                    search, limit or constants.INGREDIENT_SEARCH_LIMIT
+                )
+            )
+        name = request.query_params.get("name")
+        if name is None:
+            return super().list(request, *args, **kwargs)
+        return Response(ingredient_prefix_index.search(name, limit))
+
+    @conditional_get(
+        lambda view: get_catalog_validators(INGREDIENTS_VERSION)
+    )
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     permission_classes = (IsAdminAuthorOrReadOnly,)
     pagination_class = CustomLimitPagination
+    cursor_pagination_actions = ("list",)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
-    queryset = Recipe.objects.select_related("author").prefetch_related(
-        "tags", "ingredients"
-    )
+    queryset = Recipe.objects.select_related("author")
+    read_actions = ("list", "retrieve", "get_link")
+    render_recipes = staticmethod(render_recipe_documents)
+
+    def get_queryset(self):
+        return super().get_queryset().with_user_flags(self.request.user)
 
     def get_serializer_class(self):
-        if self.action in ("list", "retrieve", "get-link"):
+        if self.action in self.read_actions:
             return RecipeReadSerializer
         return RecipeWriteSerializer
 
+    def get_user_version(self):
+        user = self.request.user
+        if user.is_anonymous:
+            return None
+        return get_version(user_version(user.pk))
+
+    def get_list_validators(self, *names):
+        versions = [
+            get_version(name)
+            for name in (RECIPES_VERSION, RECIPE_LIST_VERSION, *names)
+        ]
+        user_marks_version = self.get_user_version()
+        if user_marks_version is not None:
+            versions.append(user_marks_version)
+        return (
+            (self.request.user.pk, versions),
+            version_to_datetime(max(versions)),
+        )
+
+    def get_count_version(self):
+        return self.get_list_validators()[0]
+
+    def get_detail_validators(self):
+        try:
+            dates = (
+                Recipe.objects.filter(pk=self.kwargs["pk"])
+                .values_list("updated_at", "author__updated_at")
+                .first()
+            )
+        except ValueError:
+            return None
+        if dates is None:
+            return None
+        user_marks_version = self.get_user_version()
+        last_modified = max(dates)
+        if user_marks_version is not None:
+            last_modified = max(
+                last_modified, version_to_datetime(user_marks_version)
+            )
+        return (
+            (self.request.user.pk, dates, user_marks_version),
+            last_modified,
+        )
+
+    @conditional_get(lambda view: view.get_list_validators())
+    @anonymous_response_cache(
+        lambda view: (RECIPES_VERSION, RECIPE_LIST_VERSION)
+    )
+    def list(self, request, *args, **kwargs):
+        rows = self.filter_queryset(self.get_queryset()).values(
+            *RECIPE_ROW_FIELDS
+        )
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(self.render_recipes(rows, request))
+        return self.get_paginated_response(self.render_recipes(page, request))
+
+    @conditional_get(lambda view: view.get_detail_validators())
+    @anonymous_response_cache(
+        lambda view: (RECIPES_VERSION, recipe_version(view.kwargs["pk"]))
+    )
+    def retrieve(self, request, *args, **kwargs):
+        row = get_row_or_404(
+            self.filter_queryset(self.get_queryset()).values(
+                *RECIPE_ROW_FIELDS
+            ),
+            pk=self.kwargs["pk"],
+        )
+        self.check_object_permissions(request, row)
+        return Response(self.render_recipes([row], request)[0])
+
+    def render_written(self, serializer):
+        """Сохраняет документ записанного рецепта и возвращает ответ.
+
+        Представление собирается из объектов, только что записанных
+        сериализатором, без повторного чтения рецепта из базы.
+        """
+        recipe = serializer.instance
+        documents = strip_user_flags(
+            [
+                render_written_recipe(
+                    recipe,
+                    serializer.written_tags,
+                    serializer.written_ingredients,
+                    serializer.ingredient_details,
+                )
+            ]
+        )
+        store_recipe_documents(documents)
+        if recipe.author_id == self.request.user.pk:
+            subscribed_ids = frozenset()
+        else:
+            subscribed_ids = get_subscribed_author_ids(self.request)
+        return merge_recipe_document(
+            documents[recipe.pk],
+            {
+                "is_favorited": getattr(recipe, "is_favorited", False),
+                "is_in_shopping_cart": getattr(
+                    recipe, "is_in_shopping_cart", False
+                ),
+            },
+            subscribed_ids,
+            self.request,
+        )
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        with transaction.atomic():
+            serializer.is_valid(raise_exception=True)
+            self.perform_create(serializer)
+            data = self.render_written(serializer)
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    def update(self, request, *args, **kwargs):
+        partial = kwargs.pop("partial", False)
+        with transaction.atomic():
+            serializer = self.get_serializer(
+                self.get_object(), data=request.data, partial=partial
+            )
+            serializer.is_valid(raise_exception=True)
+            self.perform_update(serializer)
+            data = self.render_written(serializer)
+        return Response(data)
+
+    @action(
+        detail=False,
+        methods=["GET"],
+        permission_classes=[AllowAny],
+        url_path="cookable",
+        url_name="cookable",
+    )
+    @conditional_get(lambda view: view.get_list_validators())
+    @anonymous_response_cache(
+        lambda view: (RECIPES_VERSION, RECIPE_LIST_VERSION)
+    )
+    def cookable(self, request):
+        """Рецепты, которые можно приготовить из имеющихся ингредиентов.
+
+        Сначала идут рецепты, для которых есть все ингредиенты, затем
+        рецепты, где не хватает одного, двух и т. д.
+        """
+        serializer = RecipeCoverageQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        matches = recipe_coverage_index.search(
+            serializer.validated_data["ingredients"],
+            serializer.validated_data.get("max_missing"),
+        )
+        page = self.paginate_queryset(matches)
+        missing = dict(matches if page is None else page)
+        rows = {
+            row["id"]: row
+            for row in self.get_queryset()
+            .filter(pk__in=missing)
+            .values(*RECIPE_ROW_FIELDS)
+        }
+        data = self.render_recipes(
+            [rows[pk] for pk in missing if pk in rows], request
+        )
+        for item in data:
+            item["missing_ingredients"] = missing[item["id"]]
+        if page is None:
+            return Response(data)
+        return self.get_paginated_response(data)
+
+    @action(
+        detail=True,
+        methods=["GET"],
+        permission_classes=[AllowAny],
+        url_path="similar",
+        url_name="similar",
+    )
+    @conditional_get(
+        lambda view: view.get_list_validators(RECIPE_SIGNATURES_VERSION)
+    )
+    @anonymous_response_cache(
+        lambda view: (
+            RECIPES_VERSION, RECIPE_LIST_VERSION, RECIPE_SIGNATURES_VERSION
+        )
+    )
+    def similar(self, request, pk=None):
+        """Рецепты с наиболее похожим набором ингредиентов и тегов."""
+        recipe = get_object_or_404(Recipe, pk=pk)
+        limit = request.query_params.get("limit", "")
+        similarity = dict(
+            find_similar_recipes(
+                recipe.pk,
+                int(limit) if limit.isdigit()
+                else constants.SIMILAR_RECIPES_LIMIT,
+            )
+        )
+        rows = {
+            row["id"]: row
+            for row in self.get_queryset()
+            .filter(pk__in=similarity)
+            .values(*RECIPE_ROW_FIELDS)
+        }
+        data = self.render_recipes(
+            [rows[pk] for pk in similarity if pk in rows], request
+        )
+        for item in data:
+            item["similarity"] = round(similarity[item["id"]], 3)
+        return Response(data)
+
     @action(
         detail=True,
         methods=["GET"],
@@ -188,6 +606,23 @@ class RecipeViewSet(viewsets.ModelViewSet):
             status=status.HTTP_200_OK,
         )
 
+    @action(
+        detail=False,
+        methods=["POST", "DELETE"],
+        permission_classes=[IsAuthenticated],
+        url_path="shopping_cart",
+        url_name="shopping_cart-batch",
+    )
+    def shopping_cart_batch(self, request):
+        """Добавление нескольких рецептов в покупки или удаление из них."""
+        return batch_user_marks(
+            request,
+            ShoppingList,
+            Recipe,
+            "recipe",
+            on_change=change_shopping_list,
+        )
+
     @action(
         detail=True,
         methods=["POST", "DELETE"],
@@ -200,22 +635,16 @@ class RecipeViewSet(viewsets.ModelViewSet):
         recipe = get_object_or_404(Recipe, id=pk)
 
         if request.method == "POST":
-            data = {"user": user.id, "recipe": recipe.id}
-            serializer = ShoppingCartCreateSerializer(
-                data=data, context={"request": request}
-            )
-            if serializer.is_valid():
-                serializer.save()
-                serializer = ShortRecipeSerializer(
-                    recipe, context={"request": request}
-                )
-                return Response(
-                    serializer.data, status=status.HTTP_201_CREATED
+            with transaction.atomic():
+                created = create_if_absent(
+                    ShoppingList, user=user, recipe=recipe
                 )
-
-            return Response(
-                serializer.errors, status=status.HTTP_400_BAD_REQUEST
+            if created is None:
+                return unique_together_error("user", "recipe")
+            serializer = ShortRecipeSerializer(
+                recipe, context={"request": request}
             )
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         elif request.method == "DELETE":
             deleted_count, _ = ShoppingList.objects.filter(
@@ -228,31 +657,85 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 )
             return Response(status=status.HTTP_204_NO_CONTENT)
 
-    @staticmethod
-    def shopping_list_to_txt(ingredients):
-        return "\n".join(
-            f'{ingredient["ingredient__name"]} - {ingredient["sum"]} '
-            f'({ingredient["ingredient__measurement_unit"]})'
-            for ingredient in ingredients
-        )
-
     @action(
         detail=False,
         methods=["GET"],
         permission_classes=[IsAuthenticated],
         url_path="download_shopping_cart",
         url_name="download_shopping_cart",
+        renderer_classes=SHOPPING_LIST_RENDERERS,
     )
+    @conditional_get(lambda view: view.get_shopping_list_validators())
     def download_shopping_cart(self, request):
-        ingredients = (
-            RecipeIngredient.objects.filter(
-                recipe__shopping_list__user=request.user
+        """Выгрузка списка покупок в формате txt, csv, json или pdf.
+
+        Формат выбирается параметром ``format`` или заголовком ``Accept``.
+        Итоги читаются из ``ShoppingListIngredient`` и отдаются клиенту
+        частями. Готовая выгрузка кешируется для пользователя до
+        изменения его списка покупок или справочника ингредиентов.
+        """
+        renderer = request.accepted_renderer
+        content_type = (
+            f"{renderer.media_type}; charset={renderer.charset}"
+            if renderer.charset
+            else renderer.media_type
+        )
+        key = "shopping_list:{}".format(
+            hashlib.md5(
+                repr(self.get_shopping_list_validators()[0]).encode()
+            ).hexdigest()
+        )
+        content = cache.get(key)
+        if content is not None:
+            response = HttpResponse(content, content_type=content_type)
+        else:
+            response = StreamingHttpResponse(
+                cache_stream(
+                    key,
+                    renderer.stream(self.get_shopping_list_rows()),
+                    constants.SHOPPING_LIST_CACHE_MAX_SIZE,
+                ),
+                content_type=content_type,
+            )
+        response["Content-Disposition"] = (
+            "attachment; "
+            f'filename="{constants.SHOPPING_LIST_FILENAME}.{renderer.format}"'
+        )
+        patch_cache_control(response, private=True)
+        patch_vary_headers(response, ("Accept",))
+        return response
+
+    def get_shopping_list_validators(self):
+        user = self.request.user
+        versions = [
+            get_version(cart_version(user.pk)),
+            get_version(INGREDIENTS_VERSION),
+        ]
+        return (
+            (user.pk, versions, self.request.accepted_renderer.format),
+            version_to_datetime(max(versions)),
+        )
+
+    def get_shopping_list_rows(self):
+        return (
+            ShoppingListIngredient.objects.filter(user=self.request.user)
+            .values_list(
+                "ingredient__name", "ingredient__measurement_unit", "amount"
             )
-            .values("ingredient__name", "ingredient__measurement_unit")
-            .annotate(sum=Sum("amount"))
+            .order_by("ingredient__name", "ingredient__measurement_unit")
+            .iterator(chunk_size=constants.SHOPPING_LIST_QUERY_CHUNK_SIZE)
         )
-        shopping_list = self.shopping_list_to_txt(ingredients)
-        return HttpResponse(shopping_list, content_type="text/plain")
+
+    @action(
+        detail=False,
+        methods=["POST", "DELETE"],
+        permission_classes=[IsAuthenticated],
+        url_path="favorite",
+        url_name="favorite-batch",
+    )
+    def favorite_batch(self, request):
+        """Добавление нескольких рецептов в избранное или удаление из него."""
+        return batch_user_marks(request, Favorite, Recipe, "recipe")
 
     @action(
         detail=True,
@@ -266,22 +749,13 @@ class RecipeViewSet(viewsets.ModelViewSet):
         recipe = get_object_or_404(Recipe, id=pk)
 
         if request.method == "POST":
-            data = {"user": user.id, "recipe": recipe.id}
-            serializer = FavoriteCreateSerializer(
-                data=data, context={"request": request}
-            )
-            if serializer.is_valid():
-                serializer.save()
-                serializer = ShortRecipeSerializer(
-                    recipe, context={"request": request}
-                )
-                return Response(
-                    serializer.data, status=status.HTTP_201_CREATED
-                )
-
-            return Response(
-                serializer.errors, status=status.HTTP_400_BAD_REQUEST
+            created = create_if_absent(Favorite, user=user, recipe=recipe)
+            if created is None:
+                return unique_together_error("user", "recipe")
+            serializer = ShortRecipeSerializer(
+                recipe, context={"request": request}
             )
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         elif request.method == "DELETE":
             deleted_count, _ = Favorite.objects.filter(
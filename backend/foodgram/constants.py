@@ -16,3 +16,22 @@ INGREDIENT_AMOUNT_MIN = 1
 INGREDIENT_AMOUNT_MAX = 1000
 FULL_URL_MAX_LENGTH = 256
 SHORT_URL_MAX_LENGTH = 100
+PAGINATION_MODE_QUERY_PARAM = "pagination"
+PAGINATION_MODE_CURSOR = "cursor"
+PAGINATION_COUNT_CACHE_PREFIX = "pagination_count"
+INGREDIENT_SEARCH_LIMIT = 20
+INGREDIENT_SIMILARITY_MIN = 0.3
+RECIPE_COVERAGE_SYNC_OVERLAP = 5
+RECIPE_SIGNATURE_PERMUTATIONS = 96
+RECIPE_SIGNATURE_BAND_ROWS = 3
+RECIPE_SIGNATURE_SEED = 1729
+RECIPE_SIGNATURE_BATCH_SIZE = 5000
+SIMILAR_RECIPES_LIMIT = 6
+TAG_MASK_MAX_TAGS = 63
+TAG_MASK_IN_LIST_MAX_TAGS = 8
+BATCH_MAX_IDS = 100
+STREAM_CHUNK_SIZE = 8192
+SHOPPING_LIST_FILENAME = "shopping-list"
+SHOPPING_LIST_QUERY_CHUNK_SIZE = 500
+SHOPPING_LIST_BATCH_SIZE = 500
+SHOPPING_LIST_CACHE_MAX_SIZE = 1048576
@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
 from django.core.management.utils import get_random_secret_key
 from dotenv import load_dotenv
 
@@ -28,6 +29,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework.authtoken",
     "djoser",
@@ -89,6 +91,42 @@ else:
         }
     }
 
+LOCMEM_CACHE_BACKEND = "django.core.cache.backends.locmem.LocMemCache"
+
+# Версии кеша должны быть видны всем процессам и командам управления,
+# поэтому вне локального запуска кеш хранится в Redis.
+if IS_LOCAL:
+    CACHES = {
+        "default": {
+            "BACKEND": os.getenv("CACHE_BACKEND", LOCMEM_CACHE_BACKEND),
+            "LOCATION": os.getenv("CACHE_LOCATION", ""),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": os.getenv(
+                "CACHE_BACKEND", "django.core.cache.backends.redis.RedisCache"
+            ),
+            "LOCATION": os.getenv("CACHE_LOCATION", "redis://redis:6379/0"),
+        }
+    }
+
+if CACHES["default"]["BACKEND"] == LOCMEM_CACHE_BACKEND and not (
+    DEBUG or IS_LOCAL
+):
+    raise ImproperlyConfigured(
+        "Кеш в памяти процесса допустим только при DEBUG или IS_LOCAL: "
+        "укажите общий кеш в CACHE_BACKEND и CACHE_LOCATION."
+    )
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv("RESPONSE_CACHE_TIMEOUT", 3600))
+
+# Шрифт TrueType с кириллицей, подмножество которого встраивается в PDF.
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    "SHOPPING_LIST_PDF_FONT", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+)
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -128,6 +166,15 @@ AUTH_USER_MODEL = "users.User"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "api.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
@@ -139,6 +186,14 @@ REST_FRAMEWORK = {
     ],
 }
 
+PAGINATION_COUNT_CACHE_TIMEOUT = int(
+    os.getenv("PAGINATION_COUNT_CACHE_TIMEOUT", 30)
+)
+
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = int(
+    os.getenv("PAGINATION_COUNT_ESTIMATE_THRESHOLD", 100000)
+)
+
 
 DJOSER = {
     "LOGIN_FIELD": "email",
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Ingredient, Recipe, ShoppingList, Tag
+from recipes.shopping_lists import rebuild_shopping_lists
+from recipes.signals import recipe_relations_saved
+from recipes.similarity import update_recipe_signatures
 
 from foodgram import constants
 
@@ -38,6 +41,16 @@ class RecipeAdmin(admin.ModelAdmin):
             .prefetch_related("ingredient_list__ingredient")
         )
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        update_recipe_signatures([form.instance.pk])
+        rebuild_shopping_lists(
+            ShoppingList.objects.filter(recipe=form.instance).values_list(
+                "user_id", flat=True
+            )
+        )
+        recipe_relations_saved.send(sender=Recipe, instance=form.instance)
+
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand, CommandError
+from recipes.models import ShoppingList, ShoppingListIngredient
+from recipes.shopping_lists import (
+    expected_shopping_list_totals,
+    rebuild_shopping_lists,
+    stored_shopping_list_totals,
+)
+
+from foodgram import constants
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает итоги списков покупок по рецептам в них и сообщает "
+        "о расхождениях с сохраненными итогами."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Пересобрать итоги пользователей с расхождениями.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=constants.SHOPPING_LIST_BATCH_SIZE,
+            help="Количество пользователей, проверяемых за один проход.",
+        )
+
+    def handle(self, *args, **options):
+        user_ids = sorted(
+            set(ShoppingList.objects.values_list("user_id", flat=True))
+            | set(
+                ShoppingListIngredient.objects.values_list(
+                    "user_id", flat=True
+                )
+            )
+        )
+        batch_size = options["batch_size"]
+        drifted = []
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            expected = expected_shopping_list_totals(batch)
+            stored = stored_shopping_list_totals(batch)
+            for user_id in batch:
+                wrong = {
+                    ingredient_id
+                    for ingredient_id in (
+                        expected[user_id].keys() | stored[user_id].keys()
+                    )
+                    if expected[user_id].get(ingredient_id)
+                    != stored[user_id].get(ingredient_id)
+                }
+                if wrong:
+                    drifted.append(user_id)
+                    self.stdout.write(
+                        f"Пользователь {user_id}: расхождений {len(wrong)}"
+                    )
+        self.stdout.write(
+            f"Проверено пользователей: {len(user_ids)}, "
+            f"с расхождениями: {len(drifted)}"
+        )
+        if not drifted:
+            return
+        if not options["fix"]:
+            raise CommandError("Итоги списков покупок расходятся с рецептами.")
+        for start in range(0, len(drifted), batch_size):
+            rebuild_shopping_lists(drifted[start:start + batch_size])
+        self.stdout.write(f"Пересобрано пользователей: {len(drifted)}")
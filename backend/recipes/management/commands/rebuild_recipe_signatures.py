@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from recipes.models import Recipe
+from recipes.similarity import update_recipe_signatures
+
+from foodgram import constants
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает MinHash-сигнатуры и корзины LSH всех рецептов."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=constants.RECIPE_SIGNATURE_BATCH_SIZE,
+            help="Количество рецептов, обрабатываемых за один проход.",
+        )
+
+    def handle(self, *args, **options):
+        recipe_ids = list(
+            Recipe.objects.order_by("pk").values_list("pk", flat=True)
+        )
+        batch_size = options["batch_size"]
+        total = 0
+        for start in range(0, len(recipe_ids), batch_size):
+            total += update_recipe_signatures(
+                recipe_ids[start:start + batch_size]
+            )
+        self.stdout.write(f"Пересчитано сигнатур: {total}")
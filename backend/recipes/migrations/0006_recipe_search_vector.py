@@ -0,0 +1,55 @@
+# Generated by Django 5.1.3 on 2026-10-17 10:00
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+POSTGRESQL_FORWARD_SQL = (
+    "CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector "
+    "ON recipes_recipe USING gin (search_vector);"
+    "UPDATE recipes_recipe SET search_vector = "
+    "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(text, '')), 'B');"
+)
+POSTGRESQL_BACKWARD_SQL = "DROP INDEX IF EXISTS recipes_recipe_search_vector;"
+SQLITE_FORWARD_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_fts "
+    "USING fts5(name, text, tokenize = 'unicode61 remove_diacritics 2');",
+    "INSERT INTO recipes_recipe_fts (rowid, name, text) "
+    "SELECT id, name, text FROM recipes_recipe;",
+)
+SQLITE_BACKWARD_SQL = "DROP TABLE IF EXISTS recipes_recipe_fts;"
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(POSTGRESQL_FORWARD_SQL)
+    elif vendor == "sqlite":
+        for sql in SQLITE_FORWARD_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(POSTGRESQL_BACKWARD_SQL)
+    elif vendor == "sqlite":
+        schema_editor.execute(SQLITE_BACKWARD_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0005_ingredient_name_trigram_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True, verbose_name="Поисковый вектор"
+            ),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
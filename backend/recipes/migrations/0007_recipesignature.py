@@ -0,0 +1,88 @@
+# Generated by Django 5.1.3 on 2026-10-17 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0006_recipe_search_vector"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeSignature",
+            fields=[
+                (
+                    "recipe",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="signature",
+                        serialize=False,
+                        to="recipes.recipe",
+                        verbose_name="Рецепт",
+                    ),
+                ),
+                ("minhash", models.BinaryField(verbose_name="Сигнатура")),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        auto_now=True, verbose_name="Дата изменения"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Сигнатура рецепта",
+                "verbose_name_plural": "Сигнатуры рецептов",
+            },
+        ),
+        migrations.CreateModel(
+            name="RecipeSignatureBucket",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "band",
+                    models.PositiveSmallIntegerField(verbose_name="Полоса"),
+                ),
+                (
+                    "key",
+                    models.BigIntegerField(verbose_name="Ключ корзины"),
+                ),
+                (
+                    "recipe",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="signature_buckets",
+                        to="recipes.recipe",
+                        verbose_name="Рецепт",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Корзина сигнатуры рецепта",
+                "verbose_name_plural": "Корзины сигнатур рецептов",
+                "indexes": [
+                    models.Index(
+                        fields=["band", "key"],
+                        name="recipe_bucket_band_key_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("recipe", "band"),
+                        name="unique_recipe_bucket_band",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.1.3 on 2026-10-17 10:00
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def assign_tag_masks(apps, schema_editor):
+    Tag = apps.get_model("recipes", "Tag")
+    tags = list(Tag.objects.order_by("id"))
+    for bit, tag in enumerate(tags):
+        tag.mask = 1 << bit
+    Tag.objects.bulk_update(tags, ("mask",))
+
+
+def fill_recipe_tag_masks(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    Recipe.objects.update(
+        tag_mask=Coalesce(
+            Subquery(
+                Recipe.tags.through.objects.filter(recipe=OuterRef("pk"))
+                .values("recipe")
+                .annotate(mask=Sum("tag__mask"))
+                .values("mask")
+            ),
+            0,
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0007_recipesignature"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tag",
+            name="mask",
+            field=models.BigIntegerField(
+                editable=False, null=True, verbose_name="Битовая маска"
+            ),
+        ),
+        migrations.RunPython(assign_tag_masks, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="tag",
+            name="mask",
+            field=models.BigIntegerField(
+                editable=False, unique=True, verbose_name="Битовая маска"
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="tag_mask",
+            field=models.BigIntegerField(
+                db_index=True,
+                default=0,
+                editable=False,
+                verbose_name="Маска тегов",
+            ),
+        ),
+        migrations.RunPython(
+            fill_recipe_tag_masks, migrations.RunPython.noop
+        ),
+    ]
@@ -1,10 +1,38 @@
+from django.contrib.postgres.search import SearchVectorField
+from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import (
+    Exists,
+    F,
+    OuterRef,
+    Prefetch,
+    Subquery,
+    Sum,
+    Value,
+    Window,
+)
+from django.db.models.functions import Coalesce, RowNumber
+from django.dispatch import Signal
 from users.models import User
 
 from foodgram import constants
 
 
+# Отправляется после массового создания объектов справочника через
+# ``bulk_create``, который не отправляет сигналы ``post_save``.
+catalog_bulk_created = Signal()
+
+
+class IngredientQuerySet(models.QuerySet):
+    """Набор запросов для ингредиентов."""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        created = super().bulk_create(objs, *args, **kwargs)
+        catalog_bulk_created.send(sender=self.model)
+        return created
+
+
 class Ingredient(models.Model):
     """Модель для хранения информации об ингредиентах."""
 
@@ -18,6 +46,8 @@ class Ingredient(models.Model):
         verbose_name="Единица измерения",
     )
 
+    objects = IngredientQuerySet.as_manager()
+
     class Meta:
         ordering = ["-id"]
         verbose_name = "Ингредиент"
@@ -33,6 +63,40 @@ class Ingredient(models.Model):
         return f"{self.name} ({self.measurement_unit})"
 
 
+class TagQuerySet(models.QuerySet):
+    """Набор запросов для тегов."""
+
+    def assign_masks(self, tags):
+        """Назначает свободные биты маски тегам, у которых их еще нет."""
+        tags = [tag for tag in tags if tag.mask is None]
+        if not tags:
+            return
+        used = set(self.values_list("mask", flat=True))
+        free = (
+            1 << bit
+            for bit in range(constants.TAG_MASK_MAX_TAGS)
+            if 1 << bit not in used
+        )
+        for tag in tags:
+            tag.mask = next(free, None)
+            if tag.mask is None:
+                raise ValidationError(
+                    f"Нельзя создать больше "
+                    f"{constants.TAG_MASK_MAX_TAGS} тегов."
+                )
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        self.assign_masks(objs)
+        created = super().bulk_create(objs, *args, **kwargs)
+        catalog_bulk_created.send(sender=self.model)
+        return created
+
+    def combined_mask(self):
+        """Возвращает маску, объединяющую биты всех тегов."""
+        return self.aggregate(mask=Coalesce(Sum("mask"), 0))["mask"]
+
+
 class Tag(models.Model):
     """Модель для тегов, которые используются для классификации рецептов."""
 
@@ -45,6 +109,13 @@ class Tag(models.Model):
         unique=True,
         verbose_name="Идентификатор",
     )
+    mask = models.BigIntegerField(
+        unique=True,
+        editable=False,
+        verbose_name="Битовая маска",
+    )
+
+    objects = TagQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Тег"
@@ -53,6 +124,87 @@ class Tag(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        type(self).objects.assign_masks([self])
+        super().save(*args, **kwargs)
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Набор запросов для рецептов."""
+
+    def with_user_flags(self, user):
+        """Аннотирует рецепты флагами избранного и списка покупок."""
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+            )
+        return self.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef("pk"))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingList.objects.filter(user=user, recipe=OuterRef("pk"))
+            ),
+        )
+
+    def with_any_tags(self, mask, combined=None):
+        """Отбирает рецепты, у которых есть хотя бы один тег из маски.
+
+        Пока тегов немного, условие записывается как перечисление всех
+        значений маски, пересекающихся с запрошенной, и использует индекс
+        по ``tag_mask``. Иначе применяется побитовое И. Объединенную маску
+        всех тегов можно передать, чтобы не запрашивать ее из базы.
+        """
+        if combined is None:
+            combined = Tag.objects.combined_mask()
+        if bin(combined).count("1") > constants.TAG_MASK_IN_LIST_MAX_TAGS:
+            return self.alias(
+                matched_tags=F("tag_mask").bitand(mask)
+            ).exclude(matched_tags=0)
+        masks = []
+        submask = combined
+        while submask:
+            if submask & mask:
+                masks.append(submask)
+            submask = (submask - 1) & combined
+        return self.filter(tag_mask__in=masks)
+
+    def update_tag_masks(self, **fields):
+        """Пересчитывает маски тегов рецептов одним запросом."""
+        return self.update(
+            **fields,
+            tag_mask=Coalesce(
+                Subquery(
+                    Recipe.tags.through.objects.filter(recipe=OuterRef("pk"))
+                    .values("recipe")
+                    .annotate(mask=Sum("tag__mask"))
+                    .values("mask")
+                ),
+                0,
+            )
+        )
+
+    def latest_per_author(self, limit):
+        """Оставляет не больше ``limit`` первых рецептов каждого автора.
+
+        Рецепты нумеруются оконной функцией в порядке сортировки модели,
+        поэтому рецепты всех авторов выбираются одним запросом.
+        """
+        return self.annotate(
+            author_position=Window(
+                RowNumber(),
+                partition_by=F("author_id"),
+                order_by=self.model._meta.ordering,
+            )
+        ).filter(author_position__lte=limit)
+
+    def with_read_relations(self):
+        """Загружает связанные данные, необходимые для чтения рецептов."""
+        return self.select_related("author").prefetch_related(
+            *RECIPE_READ_PREFETCHES
+        )
+
 
 class Recipe(models.Model):
     """Модель для хранения рецептов."""
@@ -98,6 +250,25 @@ class Recipe(models.Model):
         related_name="recipes",
         verbose_name="Теги рецепта",
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Дата изменения",
+    )
+    tag_mask = models.BigIntegerField(
+        default=0,
+        editable=False,
+        db_index=True,
+        verbose_name="Маска тегов",
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name="Поисковый вектор",
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
+    COMPUTED_FIELDS = ("tag_mask", "search_vector")
 
     class Meta:
         ordering = ("-id",)
@@ -107,6 +278,28 @@ class Recipe(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """Сохраняет рецепт, не перезаписывая вычисляемые поля.
+
+        Маска тегов и поисковый вектор пересчитываются запросами в
+        обработчиках сигналов, поэтому при обновлении значения в памяти
+        могут быть устаревшими и в базу не записываются.
+        """
+        if (
+            not self._state.adding
+            and not kwargs.get("force_insert")
+            and kwargs.get("update_fields") is None
+        ):
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.name not in self.COMPUTED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class RecipeIngredient(models.Model):
     """Промежуточная модель для связи рецептов с ингредиентами."""
@@ -152,6 +345,101 @@ class RecipeIngredient(models.Model):
         return f"Рецепт {self.recipe} содержит ингредиент {self.ingredient}"
 
 
+class RecipeDocument(models.Model):
+    """Денормализованное представление рецепта для чтения через API."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="document",
+        verbose_name="Рецепт",
+    )
+    data = models.JSONField(
+        verbose_name="Документ",
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Дата изменения",
+    )
+
+    class Meta:
+        verbose_name = "Документ рецепта"
+        verbose_name_plural = "Документы рецептов"
+
+    def __str__(self):
+        return f"Документ рецепта {self.recipe_id}"
+
+
+class RecipeSignature(models.Model):
+    """MinHash-сигнатура множества ингредиентов и тегов рецепта."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="signature",
+        verbose_name="Рецепт",
+    )
+    minhash = models.BinaryField(
+        verbose_name="Сигнатура",
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Дата изменения",
+    )
+
+    class Meta:
+        verbose_name = "Сигнатура рецепта"
+        verbose_name_plural = "Сигнатуры рецептов"
+
+    def __str__(self):
+        return f"Сигнатура рецепта {self.recipe_id}"
+
+
+class RecipeSignatureBucket(models.Model):
+    """Корзина LSH, в которую попадает полоса сигнатуры рецепта."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="signature_buckets",
+        verbose_name="Рецепт",
+    )
+    band = models.PositiveSmallIntegerField(
+        verbose_name="Полоса",
+    )
+    key = models.BigIntegerField(
+        verbose_name="Ключ корзины",
+    )
+
+    class Meta:
+        verbose_name = "Корзина сигнатуры рецепта"
+        verbose_name_plural = "Корзины сигнатур рецептов"
+        indexes = (
+            models.Index(
+                fields=("band", "key"), name="recipe_bucket_band_key_idx"
+            ),
+        )
+        constraints = (
+            models.UniqueConstraint(
+                fields=("recipe", "band"), name="unique_recipe_bucket_band"
+            ),
+        )
+
+    def __str__(self):
+        return f"Корзина {self.band}:{self.key} рецепта {self.recipe_id}"
+
+
+RECIPE_READ_PREFETCHES = (
+    Prefetch("tags", queryset=Tag.objects.order_by("id")),
+    Prefetch(
+        "ingredient_list",
+        queryset=RecipeIngredient.objects.select_related("ingredient"),
+    ),
+)
+
+
 class Favorite(models.Model):
     """Модель для хранения информации о рецептах в избранном."""
 
@@ -213,3 +501,40 @@ class ShoppingList(models.Model):
         return (
             f"Пользователь {self.user} добавил {self.recipe} в список покупок"
         )
+
+
+class ShoppingListIngredient(models.Model):
+    """Итоговое количество ингредиента в списке покупок пользователя.
+
+    Поддерживается при добавлении и удалении рецептов из списка покупок
+    и при изменении ингредиентов рецептов, поэтому выгрузка списка не
+    агрегирует ингредиенты всех рецептов.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="shopping_list_ingredients",
+        verbose_name="Пользователь",
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name="shopping_list_totals",
+        verbose_name="Ингредиент",
+    )
+    amount = models.BigIntegerField(verbose_name="Количество")
+
+    class Meta:
+        verbose_name = "Ингредиент списка покупок"
+        verbose_name_plural = "Ингредиенты списков покупок"
+
+        constraints = (
+            models.UniqueConstraint(
+                fields=("user", "ingredient"),
+                name="unique_shopping_list_ingredient",
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.ingredient} - {self.amount} у пользователя {self.user}"
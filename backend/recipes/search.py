@@ -0,0 +1,104 @@
+import re
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+)
+from django.db import connection
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = "russian"
+FTS_TABLE = "recipes_recipe_fts"
+WORD_RE = re.compile(r"\w+")
+STEM_MIN_LENGTH = 4
+STEM_SUFFIX_LENGTH = 2
+
+
+def is_postgresql():
+    return connection.vendor == "postgresql"
+
+
+def recipe_search_vector():
+    return SearchVector(
+        "name", weight="A", config=SEARCH_CONFIG
+    ) + SearchVector("text", weight="B", config=SEARCH_CONFIG)
+
+
+def update_search_index(recipe):
+    """Обновляет поисковый индекс рецепта после сохранения."""
+    if is_postgresql():
+        type(recipe).objects.filter(pk=recipe.pk).update(
+            search_vector=recipe_search_vector()
+        )
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [recipe.pk]
+        )
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, text) VALUES (%s, %s, %s)",
+            [recipe.pk, recipe.name, recipe.text],
+        )
+
+
+def delete_from_search_index(recipe_id):
+    if is_postgresql():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [recipe_id]
+        )
+
+
+def fts_match_query(query):
+    """Строит запрос FTS5 из слов пользователя.
+
+    FTS5 не умеет стеммировать русский текст, поэтому окончания длинных
+    слов отбрасываются, а слово ищется как префикс.
+    """
+    terms = []
+    for word in WORD_RE.findall(query.casefold()):
+        if len(word) > STEM_MIN_LENGTH:
+            word = word[:max(STEM_MIN_LENGTH, len(word) - STEM_SUFFIX_LENGTH)]
+        terms.append(f'"{word}"*')
+    return " ".join(terms)
+
+
+def search_recipes(queryset, query):
+    """Фильтрует рецепты по полнотекстовому запросу и сортирует их по
+    релевантности.
+
+    В PostgreSQL используется ``tsvector`` с русской морфологией, в
+    остальных базах данных — таблица SQLite FTS5.
+    """
+    if is_postgresql():
+        search_query = SearchQuery(
+            query, config=SEARCH_CONFIG, search_type="websearch"
+        )
+        return (
+            queryset.filter(search_vector=search_query)
+            .annotate(rank=SearchRank(F("search_vector"), search_query))
+            .order_by("-rank", "-id")
+        )
+    match = fts_match_query(query)
+    if not match:
+        return queryset
+    return (
+        queryset.filter(
+            id__in=RawSQL(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+                [match],
+            )
+        )
+        .annotate(
+            rank=RawSQL(
+                f"SELECT bm25({FTS_TABLE}) FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s "
+                f"AND rowid = {queryset.model._meta.db_table}.id",
+                [match],
+            )
+        )
+        .order_by("rank", "-id")
+    )
@@ -0,0 +1,159 @@
+from collections import defaultdict
+
+from django.db import connections, router, transaction
+from django.db.models import Sum
+from django.dispatch import Signal
+
+from foodgram import constants
+from recipes.models import (
+    RecipeIngredient,
+    ShoppingList,
+    ShoppingListIngredient,
+)
+
+# Отправляется с аргументом ``user_ids`` после изменения итогов списков
+# покупок этих пользователей.
+shopping_lists_changed = Signal()
+
+
+def recipe_ingredient_totals(recipe_ids):
+    """Возвращает суммарные количества ингредиентов указанных рецептов."""
+    return dict(
+        RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+        .values_list("ingredient_id")
+        .annotate(total=Sum("amount"))
+        .order_by()
+    )
+
+
+def apply_shopping_list_deltas(deltas):
+    """Прибавляет изменения ``{(id пользователя, id ингредиента): delta}``.
+
+    Итоги обновляются запросами ``INSERT ... ON CONFLICT DO UPDATE``
+    пакетами, строки с неположительным количеством удаляются.
+    """
+    rows = [
+        (user_id, ingredient_id, delta)
+        for (user_id, ingredient_id), delta in deltas.items()
+        if delta
+    ]
+    if not rows:
+        return
+    model = ShoppingListIngredient
+    connection = connections[router.db_for_write(model)]
+    quote_name = connection.ops.quote_name
+    table = quote_name(model._meta.db_table)
+    user, ingredient, amount = (
+        quote_name(model._meta.get_field(name).column)
+        for name in ("user", "ingredient", "amount")
+    )
+    batch_size = constants.SHOPPING_LIST_BATCH_SIZE
+    with transaction.atomic(using=connection.alias, savepoint=False):
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                cursor.execute(
+                    f"INSERT INTO {table} ({user}, {ingredient}, {amount}) "
+                    f"VALUES {', '.join(['(%s, %s, %s)'] * len(batch))} "
+                    f"ON CONFLICT ({user}, {ingredient}) DO UPDATE "
+                    f"SET {amount} = {table}.{amount} + EXCLUDED.{amount}",
+                    [value for row in batch for value in row],
+                )
+        reduced_user_ids = {user_id for user_id, _, delta in rows if delta < 0}
+        if reduced_user_ids:
+            ShoppingListIngredient.objects.filter(
+                user_id__in=reduced_user_ids, amount__lte=0
+            ).delete()
+    shopping_lists_changed.send(
+        sender=ShoppingListIngredient,
+        user_ids={user_id for user_id, _, _ in rows},
+    )
+
+
+def change_shopping_list(user_id, recipe_ids, sign=1):
+    """Добавляет рецепты в итоги списка покупок или вычитает их."""
+    apply_shopping_list_deltas(
+        {
+            (user_id, ingredient_id): sign * total
+            for ingredient_id, total in recipe_ingredient_totals(
+                recipe_ids
+            ).items()
+        }
+    )
+
+
+def change_recipe_in_shopping_lists(recipe_id, ingredient_deltas):
+    """Переносит изменения ингредиентов рецепта в списки покупок.
+
+    ``ingredient_deltas`` — изменения количеств ``{id ингредиента: delta}``
+    для всех пользователей, у которых рецепт в списке покупок.
+    """
+    ingredient_deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in ingredient_deltas.items()
+        if delta
+    }
+    if not ingredient_deltas:
+        return
+    apply_shopping_list_deltas(
+        {
+            (user_id, ingredient_id): delta
+            for user_id in ShoppingList.objects.filter(
+                recipe_id=recipe_id
+            ).values_list("user_id", flat=True)
+            for ingredient_id, delta in ingredient_deltas.items()
+        }
+    )
+
+
+def expected_shopping_list_totals(user_ids=None):
+    """Пересчитывает итоги списков покупок по рецептам в них.
+
+    Возвращает ``{id пользователя: {id ингредиента: количество}}``.
+    """
+    queryset = ShoppingList.objects.all()
+    if user_ids is not None:
+        queryset = queryset.filter(user__in=user_ids)
+    totals = defaultdict(dict)
+    for user_id, ingredient_id, total in (
+        queryset.values_list("user_id", "recipe__ingredient_list__ingredient")
+        .annotate(total=Sum("recipe__ingredient_list__amount"))
+        .order_by()
+        .iterator(chunk_size=constants.SHOPPING_LIST_BATCH_SIZE)
+    ):
+        if ingredient_id is not None:
+            totals[user_id][ingredient_id] = total
+    return totals
+
+
+def stored_shopping_list_totals(user_ids=None):
+    queryset = ShoppingListIngredient.objects.all()
+    if user_ids is not None:
+        queryset = queryset.filter(user__in=user_ids)
+    totals = defaultdict(dict)
+    for user_id, ingredient_id, amount in queryset.values_list(
+        "user_id", "ingredient_id", "amount"
+    ).iterator(chunk_size=constants.SHOPPING_LIST_BATCH_SIZE):
+        totals[user_id][ingredient_id] = amount
+    return totals
+
+
+@transaction.atomic
+def rebuild_shopping_lists(user_ids):
+    """Пересобирает итоги списков покупок указанных пользователей."""
+    user_ids = list(user_ids)
+    expected = expected_shopping_list_totals(user_ids)
+    ShoppingListIngredient.objects.filter(user__in=user_ids).delete()
+    ShoppingListIngredient.objects.bulk_create(
+        (
+            ShoppingListIngredient(
+                user_id=user_id, ingredient_id=ingredient_id, amount=amount
+            )
+            for user_id, totals in expected.items()
+            for ingredient_id, amount in totals.items()
+        ),
+        batch_size=constants.SHOPPING_LIST_BATCH_SIZE,
+    )
+    shopping_lists_changed.send(
+        sender=ShoppingListIngredient, user_ids=set(user_ids)
+    )
@@ -0,0 +1,118 @@
+import threading
+from contextlib import contextmanager
+
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.db.models import F
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingList,
+    Tag,
+)
+from recipes.search import delete_from_search_index, update_search_index
+from recipes.shopping_lists import change_shopping_list, rebuild_shopping_lists
+
+
+# Отправляется с аргументом ``instance`` после того, как рецепт сохранен
+# вместе с ингредиентами и тегами, например из админки.
+recipe_relations_saved = Signal()
+
+_batch = threading.local()
+
+
+@contextmanager
+def recipe_ingredients_batch():
+    """Отключает обработчики сигналов отдельных ингредиентов рецепта.
+
+    Используется при массовой записи ингредиентов, после которой рецепт
+    сохраняется сам и зависящие от него данные обновляются один раз.
+    """
+    _batch.depth = getattr(_batch, "depth", 0) + 1
+    try:
+        yield
+    finally:
+        _batch.depth -= 1
+
+
+def in_recipe_ingredients_batch():
+    return getattr(_batch, "depth", 0) > 0
+
+
+def touch_recipes(queryset):
+    """Обновляет дату изменения рецептов без вызова их сигналов."""
+    queryset.update(updated_at=timezone.now())
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    if in_recipe_ingredients_batch():
+        return
+    touch_recipes(Recipe.objects.filter(pk=instance.recipe_id))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == "pre_clear":
+        instance.cleared_recipe_ids = list(
+            Recipe.objects.filter(tags=instance).values_list("pk", flat=True)
+        )
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        recipes = Recipe.objects.filter(pk=instance.pk)
+    elif pk_set is None:
+        recipes = Recipe.objects.filter(pk__in=instance.cleared_recipe_ids)
+    else:
+        recipes = Recipe.objects.filter(pk__in=pk_set)
+    recipes.update_tag_masks(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_changed(sender, instance, created, **kwargs):
+    if not created:
+        touch_recipes(Recipe.objects.filter(ingredients=instance))
+
+
+@receiver((post_save, pre_delete), sender=Tag)
+def tag_changed(sender, instance, created=False, **kwargs):
+    if not created:
+        touch_recipes(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    Recipe.objects.alias(
+        deleted_tag=F("tag_mask").bitand(instance.mask)
+    ).exclude(deleted_tag=0).update(tag_mask=F("tag_mask") - instance.mask)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, **kwargs):
+    update_search_index(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    delete_from_search_index(instance.pk)
+
+
+@receiver(post_save, sender=ShoppingList)
+def shopping_list_saved(sender, instance, created, **kwargs):
+    if created:
+        change_shopping_list(instance.user_id, [instance.recipe_id])
+    else:
+        rebuild_shopping_lists([instance.user_id])
+
+
+@receiver(pre_delete, sender=ShoppingList)
+def shopping_list_deleting(sender, instance, **kwargs):
+    change_shopping_list(instance.user_id, [instance.recipe_id], -1)
@@ -0,0 +1,181 @@
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+from django.dispatch import Signal
+
+from foodgram import constants
+from recipes.models import (
+    Recipe,
+    RecipeIngredient,
+    RecipeSignature,
+    RecipeSignatureBucket,
+)
+
+MERSENNE_PRIME = (1 << 31) - 1
+BUCKET_KEY_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+PERMUTATIONS = constants.RECIPE_SIGNATURE_PERMUTATIONS
+BAND_ROWS = constants.RECIPE_SIGNATURE_BAND_ROWS
+BANDS = PERMUTATIONS // BAND_ROWS
+
+_random = np.random.default_rng(constants.RECIPE_SIGNATURE_SEED)
+HASH_A = _random.integers(1, MERSENNE_PRIME, PERMUTATIONS, dtype=np.int64)
+HASH_B = _random.integers(0, MERSENNE_PRIME, PERMUTATIONS, dtype=np.int64)
+
+# Отправляется с аргументом ``recipe_ids`` после изменения сигнатур этих
+# рецептов.
+recipe_signatures_changed = Signal()
+
+
+def recipe_tokens(recipe_ids):
+    """Возвращает пары массивов (id рецепта, признак) для рецептов.
+
+    Признаки ингредиентов — четные числа, признаки тегов — нечетные,
+    поэтому одинаковые id ингредиента и тега не совпадают.
+    """
+    pairs = [
+        (recipe_id, 2 * ingredient_id)
+        for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list("recipe_id", "ingredient_id")
+    ]
+    pairs.extend(
+        (recipe_id, 2 * tag_id + 1)
+        for recipe_id, tag_id in Recipe.tags.through.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list("recipe_id", "tag_id")
+    )
+    pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def compute_signatures(recipes, tokens):
+    """Считает MinHash-сигнатуры сразу для всех рецептов пакета.
+
+    Возвращает отсортированные id рецептов и матрицу сигнатур, в которой
+    каждая строка соответствует одному рецепту.
+    """
+    order = np.argsort(recipes, kind="stable")
+    recipes, tokens = recipes[order], tokens[order]
+    recipe_ids, starts = np.unique(recipes, return_index=True)
+    if not len(recipe_ids):
+        return recipe_ids, np.empty((0, PERMUTATIONS), dtype=np.uint32)
+    hashes = (
+        np.outer(tokens % MERSENNE_PRIME, HASH_A) + HASH_B
+    ) % MERSENNE_PRIME
+    signatures = np.minimum.reduceat(hashes, starts, axis=0)
+    return recipe_ids, signatures.astype(np.uint32)
+
+
+def bucket_keys(signatures):
+    """Хеширует полосы сигнатур в ключи корзин LSH."""
+    bands = signatures.reshape(-1, BANDS, BAND_ROWS).astype(np.uint64)
+    keys = np.zeros(bands.shape[:2], dtype=np.uint64)
+    for row in range(BAND_ROWS):
+        keys = keys * BUCKET_KEY_MULTIPLIER + bands[:, :, row]
+    return keys.view(np.int64)
+
+
+def update_recipe_signatures(recipe_ids):
+    """Пересчитывает сигнатуры и корзины LSH указанных рецептов.
+
+    Рецепты без ингредиентов и тегов остаются без сигнатуры. Строки
+    перезаписываются и сигнал отправляется только для рецептов, у
+    которых сигнатура изменилась.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return 0
+    signed_ids, signatures = compute_signatures(*recipe_tokens(recipe_ids))
+    computed = {
+        recipe_id: signature.tobytes()
+        for recipe_id, signature in zip(signed_ids.tolist(), signatures)
+    }
+    stored = {
+        recipe_id: bytes(minhash)
+        for recipe_id, minhash in RecipeSignature.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list("recipe_id", "minhash")
+    }
+    changed_ids = [
+        recipe_id
+        for recipe_id in recipe_ids
+        if computed.get(recipe_id) != stored.get(recipe_id)
+    ]
+    if not changed_ids:
+        return len(signed_ids)
+    changed = set(changed_ids)
+    keys = bucket_keys(signatures)
+    # Корзины есть только у рецептов с сохраненной сигнатурой.
+    stale_ids = [recipe_id for recipe_id in changed_ids if recipe_id in stored]
+    with transaction.atomic(savepoint=False):
+        if stale_ids:
+            RecipeSignature.objects.filter(recipe_id__in=stale_ids).delete()
+            RecipeSignatureBucket.objects.filter(
+                recipe_id__in=stale_ids
+            ).delete()
+        RecipeSignature.objects.bulk_create(
+            RecipeSignature(recipe_id=recipe_id, minhash=computed[recipe_id])
+            for recipe_id in signed_ids.tolist()
+            if recipe_id in changed
+        )
+        RecipeSignatureBucket.objects.bulk_create(
+            RecipeSignatureBucket(recipe_id=recipe_id, band=band, key=key)
+            for recipe_id, recipe_keys in zip(
+                signed_ids.tolist(), keys.tolist()
+            )
+            if recipe_id in changed
+            for band, key in enumerate(recipe_keys)
+        )
+    recipe_signatures_changed.send(
+        sender=RecipeSignature, recipe_ids=changed_ids
+    )
+    return len(signed_ids)
+
+
+def find_similar_recipes(recipe_id, limit):
+    """Возвращает пары (id рецепта, оценка сходства Жаккара).
+
+    Кандидаты выбираются только из корзин LSH, в которые попал сам
+    рецепт, поэтому поиск не перебирает все рецепты.
+    """
+    minhash = (
+        RecipeSignature.objects.filter(recipe_id=recipe_id)
+        .values_list("minhash", flat=True)
+        .first()
+    )
+    if minhash is not None:
+        signature = np.frombuffer(minhash, dtype=np.uint32)
+    else:
+        # Сигнатура еще не сохранена: она вычисляется в памяти, чтобы
+        # запрос на чтение ничего не записывал.
+        signed_ids, signatures = compute_signatures(
+            *recipe_tokens([recipe_id])
+        )
+        if not len(signed_ids):
+            return []
+        signature = signatures[0]
+    condition = Q()
+    for band, key in enumerate(bucket_keys(signature).ravel().tolist()):
+        condition |= Q(band=band, key=key)
+    candidates = list(
+        RecipeSignature.objects.filter(
+            recipe_id__in=RecipeSignatureBucket.objects.filter(
+                condition
+            ).values("recipe_id")
+        )
+        .exclude(recipe_id=recipe_id)
+        .values_list("recipe_id", "minhash")
+    )
+    if not candidates:
+        return []
+    candidate_ids = np.array(
+        [candidate_id for candidate_id, _ in candidates], dtype=np.int64
+    )
+    signatures = np.frombuffer(
+        b"".join(minhash for _, minhash in candidates), dtype=np.uint32
+    ).reshape(-1, PERMUTATIONS)
+    similarity = (signatures == signature).mean(axis=1)
+    order = np.lexsort((-candidate_ids, -similarity))[:limit]
+    return list(
+        zip(candidate_ids[order].tolist(), similarity[order].tolist())
+    )
@@ -45,6 +45,10 @@ class User(AbstractUser):
         upload_to="media/avatars/",
         verbose_name="Аватар",
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Дата изменения",
+    )
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ("username", "first_name", "last_name")
 